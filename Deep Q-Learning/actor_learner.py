@@ -0,0 +1,141 @@
+import argparse
+import queue
+import random
+import time
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from snake_game import SnakeGameAI
+from dqn_agent import DQNAgent, LinearQNet
+from replay_memory import ReplayMemory
+from main import MAX_MEMORY, BATCH_SIZE, LR
+
+SEND_EVERY = 256  # transizioni accumulate da un attore prima di inviarle
+
+
+def actor_epsilon(actor_id, n_actors, base=0.4, alpha=7):
+    # Epsilon diverso per ogni attore (schema Ape-X): da 0.4 fino a ~0.0007
+    if n_actors == 1:
+        return base
+    return base ** (1 + actor_id / (n_actors - 1) * alpha)
+
+
+def actor(actor_id, n_actors, shared_model, version, weights_lock, transitions, env_steps, games, stop, seed):
+    torch.set_num_threads(1)
+    random.seed(seed + actor_id)
+    torch.manual_seed(seed + actor_id)
+
+    agent = DQNAgent(11, 256, 3, 0)
+    local_version = -1
+    epsilon = actor_epsilon(actor_id, n_actors)
+    game = SnakeGameAI(visualize=False, seed=seed + actor_id)
+    batch = []
+
+    while not stop.is_set():
+        # Aggiorna i pesi quando il learner ne ha pubblicati di nuovi
+        if version.value != local_version:
+            with weights_lock:
+                agent.model.load_state_dict(shared_model.state_dict())
+                agent.policy.invalidate()
+                local_version = version.value
+
+        state_old = agent.get_state(game)
+        final_move = agent.select_action(state_old, epsilon)
+        reward, done, score = game.play_step(final_move)
+        state_new = agent.get_state(game)
+        batch.append((state_old, final_move.index(1), reward, state_new, done))
+
+        if done:
+            game.reset()
+            with games.get_lock():
+                games.value += 1
+
+        if len(batch) >= SEND_EVERY:
+            # Array NumPy: passano per la coda come semplici byte
+            states, actions, rewards, next_states, dones = zip(*batch)
+            transitions.put((torch.stack(states).numpy(), np.array(actions), np.array(rewards, dtype=np.float32),
+                             torch.stack(next_states).numpy(), np.array(dones)))
+            with env_steps.get_lock():
+                env_steps.value += len(batch)
+            batch = []
+
+
+def train_actor_learner(n_actors=4, publish_every=50, duration=60, report_every=5, seed=0):
+    # Gli attori giocano e inviano transizioni, il learner le inserisce in
+    # un'unica ReplayMemory, fa train_step di continuo e pubblica i pesi
+    agent = DQNAgent(11, 256, 3, LR)
+    memory = ReplayMemory(MAX_MEMORY)
+
+    shared_model = LinearQNet(11, 256, 3)
+    shared_model.load_state_dict(agent.model.state_dict())
+    shared_model.share_memory()
+    version = mp.Value('q', 0)
+    weights_lock = mp.Lock()
+    transitions = mp.Queue(maxsize=64)
+    env_steps = mp.Value('q', 0)
+    games = mp.Value('q', 0)
+    stop = mp.Event()
+
+    actors = [mp.Process(target=actor, args=(i, n_actors, shared_model, version, weights_lock, transitions,
+                                             env_steps, games, stop, seed))
+              for i in range(n_actors)]
+    for p in actors:
+        p.start()
+
+    updates = 0
+    start = last_report = time.perf_counter()
+    last_steps = last_updates = 0
+    try:
+        while time.perf_counter() - start < duration:
+            # Svuota la coda senza bloccare il learner
+            while True:
+                try:
+                    memory.push_many(*transitions.get_nowait())
+                except queue.Empty:
+                    break
+
+            if len(memory) > BATCH_SIZE:
+                agent.train_step(*memory.sample(BATCH_SIZE))
+                updates += 1
+                if updates % publish_every == 0:
+                    with weights_lock:
+                        shared_model.load_state_dict(agent.model.state_dict())
+                        version.value += 1
+            else:
+                time.sleep(0.01)
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                steps = env_steps.value
+                print(f"env-steps/s {(steps - last_steps) / (now - last_report):9.1f}  "
+                      f"updates/s {(updates - last_updates) / (now - last_report):7.1f}  "
+                      f"games {games.value}  replay {len(memory)}  weights v{version.value}")
+                last_report, last_steps, last_updates = now, steps, updates
+    finally:
+        stop.set()
+        # Le code vanno svuotate perche' gli attori possano terminare
+        while any(p.is_alive() for p in actors):
+            try:
+                transitions.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for p in actors:
+            p.join()
+
+    elapsed = time.perf_counter() - start
+    print(f"Total: {env_steps.value / elapsed:.1f} env-steps/s, {updates / elapsed:.1f} updates/s "
+          f"over {elapsed:.0f}s with {n_actors} actors")
+    agent.model.save()
+    return agent
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Training DQN con attori e learner in processi separati')
+    parser.add_argument('--actors', type=int, default=4)
+    parser.add_argument('--publish-every', type=int, default=50, help='train_step tra due pubblicazioni dei pesi')
+    parser.add_argument('--duration', type=float, default=600, help='secondi di training')
+    parser.add_argument('--report-every', type=float, default=5)
+    args = parser.parse_args()
+    train_actor_learner(args.actors, args.publish_every, args.duration, args.report_every)
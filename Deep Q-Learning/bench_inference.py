@@ -0,0 +1,79 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Ogni processo carica i pesi e stampa secondi trascorsi e memoria residente massima
+STARTUP = """
+import time
+start = time.perf_counter()
+import resource, sys
+sys.path.insert(0, {here!r})
+import test
+test.{loader}({path!r})
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def startup(loader, path, repeats=5):
+    # Tempo di import e caricamento (il migliore su `repeats` processi) e RSS in MB
+    runs = []
+    for _ in range(repeats):
+        code = STARTUP.format(here=HERE, loader=loader, path=os.path.abspath(path))
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        seconds, rss = out.stdout.split()[-2:]
+        runs.append((float(seconds), int(rss) / 1024))
+    return min(runs)
+
+
+def per_call(fn, repeats=20000):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def move_latency(pth_path, npz_path):
+    import torch
+    from test import load_agent, load_policy
+    from numpy_policy import game_state
+    from snake_game import SnakeGameAI
+
+    agent = load_agent(pth_path)
+    policy = load_policy(npz_path)
+    game = SnakeGameAI(visualize=False)
+    state = agent.get_state(game)
+    np_state = game_state(game)
+    batch = torch.randint(0, 2, (4096, 11)).float()
+    np_batch = batch.numpy()
+
+    def torch_forward():
+        with torch.no_grad():
+            agent.model(batch)
+
+    return {
+        'move torch (get_state + select_action)': per_call(lambda: agent.select_action(agent.get_state(game), 0)),
+        'move numpy (game_state + act)': per_call(lambda: policy.act(game_state(game, np_state))),
+        'forward torch, batch 4096': per_call(torch_forward, 200),
+        'forward numpy, batch 4096': per_call(lambda: policy.forward(np_batch), 200),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Avvio e latenza per mossa: torch contro NumPy')
+    parser.add_argument('--pth', default='model2.pth')
+    parser.add_argument('--npz', help='pesi NumPy (predefinito: convertiti da --pth)')
+    args = parser.parse_args()
+    if not args.npz:
+        from test import npz_weights
+        args.npz = npz_weights(args.pth)
+
+    for name, loader, path in (('torch', 'load_agent', args.pth), ('numpy', 'load_policy', args.npz)):
+        seconds, rss = startup(loader, path)
+        print(f'startup {name:<6} {seconds * 1e3:8.1f} ms  max RSS {rss:7.1f} MB')
+    for name, us in move_latency(args.pth, args.npz).items():
+        print(f'{name:<40} {us:9.2f} us')
@@ -0,0 +1,104 @@
+"""Replay memory su file memmap: riempimento, riapertura e latenza di sample.
+
+    python bench_memmap.py --dir /tmp/replay --capacity 1000000 10000000
+
+La latenza di sample si misura in tre condizioni:
+- ram: la ReplayMemory in memoria, come riferimento (solo se la capacita' ci sta);
+- warm: i file sono tutti nella page cache, il costo e' quello della ReplayMemory
+  piu' i page fault minori al primo accesso;
+- cold: le pagine vengono prima tolte dalla cache (posix_fadvise DONTNEED sui
+  file chiusi, su un file ancora mappato non ha effetto), ogni
+  riga campionata e' una lettura casuale dal disco. Con batch da 1000 su milioni
+  di righe quasi ogni riga cade su una pagina diversa.
+Il working set di un training e' tutto il file: se non entra nella RAM libera,
+le prestazioni si avvicinano a quelle "cold".
+"""
+import argparse
+import gc
+import os
+import shutil
+import time
+
+import torch
+
+from replay_memory import ReplayMemory, MemmapReplayMemory
+
+BATCH_SIZE = 1000
+CHUNK = 100_000
+RAM_LIMIT = 10_000_000  # oltre questa capacita' il confronto in RAM si salta
+
+
+def fill(memory, state_size=11):
+    while len(memory) < memory.capacity:
+        n = min(CHUNK, memory.capacity - len(memory))
+        memory.push_many(torch.rand(n, state_size), torch.randint(0, 3, (n,)), torch.randn(n),
+                         torch.rand(n, state_size), torch.rand(n) < 0.01)
+
+
+def sample_latency(memory, repeats=200, warmup=True):
+    if warmup:
+        memory.sample(BATCH_SIZE)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        memory.sample(BATCH_SIZE)
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def reopen_cold(memory):
+    # Chiude le mappe (le pagine mappate non si possono scartare), toglie i
+    # file dalla page cache e riapre il buffer
+    directory, capacity = memory.directory, memory.capacity
+    memory.flush()
+    files = [column.filename for column in memory.maps.values()]
+    del memory
+    gc.collect()
+    for path in files:
+        fd = os.open(path, os.O_RDONLY)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        os.close(fd)
+    return MemmapReplayMemory(directory, capacity)
+
+
+def bench(directory, capacity):
+    shutil.rmtree(directory, ignore_errors=True)
+    results = {}
+
+    start = time.perf_counter()
+    memory = MemmapReplayMemory(directory, capacity)
+    fill(memory)
+    memory.flush()
+    results['fill + flush'] = (time.perf_counter() - start, 's')
+    size_mb = sum(os.path.getsize(c.filename) for c in memory.maps.values()) / 2**20
+    results['size on disk'] = (size_mb, 'MB')
+    del memory
+
+    start = time.perf_counter()
+    memory = MemmapReplayMemory(directory, capacity)
+    results['reopen'] = ((time.perf_counter() - start) * 1e3, 'ms')
+    assert len(memory) == capacity
+
+    results['sample warm'] = (sample_latency(memory), 'us')
+    memory = reopen_cold(memory)
+    results['sample cold (first batch)'] = (sample_latency(memory, repeats=1, warmup=False), 'us')
+    memory = reopen_cold(memory)
+    results['sample cold (200 batches)'] = (sample_latency(memory, warmup=False), 'us')
+
+    if capacity <= RAM_LIMIT:
+        in_ram = ReplayMemory(capacity)
+        fill(in_ram)
+        results['sample ram'] = (sample_latency(in_ram), 'us')
+
+    del memory
+    shutil.rmtree(directory)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dir', default='replay_bench')
+    parser.add_argument('--capacity', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    args = parser.parse_args()
+
+    for capacity in args.capacity:
+        for name, (value, unit) in bench(args.dir, capacity).items():
+            print(f'capacity {capacity:>11,}  {name:<26} {value:10.1f} {unit}')
@@ -0,0 +1,42 @@
+import time
+import torch
+from replay_memory import ReplayMemory, PrioritizedReplayMemory
+
+BATCH_SIZE = 1000
+REPEATS = 200
+
+
+def fill(memory, state_size=11, chunk=100_000):
+    while len(memory) < memory.capacity:
+        n = min(chunk, memory.capacity - len(memory))
+        memory.push_many(torch.rand(n, state_size), torch.randint(0, 3, (n,)), torch.randn(n),
+                         torch.rand(n, state_size), torch.rand(n) < 0.01)
+
+
+def timeit(fn, repeats=REPEATS):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def bench(capacity):
+    uniform = ReplayMemory(capacity)
+    fill(uniform)
+    prioritized = PrioritizedReplayMemory(capacity)
+    fill(prioritized)
+    _, _, _, _, _, _, idx = prioritized.sample(BATCH_SIZE)
+    td_errors = torch.randn(BATCH_SIZE)
+
+    return {
+        'uniform sample': timeit(lambda: uniform.sample(BATCH_SIZE)),
+        'prioritized sample': timeit(lambda: prioritized.sample(BATCH_SIZE)),
+        'prioritized update': timeit(lambda: prioritized.update_priorities(idx, td_errors)),
+    }
+
+
+if __name__ == '__main__':
+    for capacity in (100_000, 1_000_000):
+        for name, us in bench(capacity).items():
+            print(f'capacity {capacity:>9,}  {name:<20} {us:9.1f} us / batch of {BATCH_SIZE}')
@@ -0,0 +1,86 @@
+import argparse
+import random
+import time
+from collections import deque
+
+import numpy as np
+import torch
+
+from vec_snake_game import VecSnakeGame
+from dqn_agent import DQNAgent
+from replay_memory import ReplayMemory
+from main import MAX_MEMORY, BATCH_SIZE, LR
+
+# Varianti confrontate: bootstrap dal modello stesso, rete target copiata ogni
+# K passi, media di Polyak, e Double DQN sopra la copia ogni K passi
+VARIANTS = {
+    'online': {},
+    'target K=100': {'target_update': 100},
+    'polyak tau=0.01': {'tau': 0.01},
+    'double K=100': {'target_update': 100, 'double': True},
+}
+
+
+def time_update(options, repeats=200):
+    # Millisecondi per train_step su un batch fisso
+    agent = DQNAgent(11, 256, 3, LR, **options)
+    memory = ReplayMemory(BATCH_SIZE * 4)
+    n = memory.capacity
+    memory.push_many(torch.rand(n, 11), torch.randint(0, 3, (n,)), torch.randn(n), torch.rand(n, 11), torch.rand(n) < 0.01)
+    batch = memory.sample(BATCH_SIZE)
+    agent.train_step(*batch)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        agent.train_step(*batch)
+    return (time.perf_counter() - start) / repeats * 1e3
+
+
+def games_to_score(options, target_score, window, max_games, n_envs, seed):
+    # Stesso ciclo di main.train_vec, senza salvataggi: si ferma quando la
+    # media delle ultime `window` partite raggiunge target_score
+    random.seed(seed)
+    torch.manual_seed(seed)
+    agent = DQNAgent(11, 256, 3, LR, **options)
+    memory = ReplayMemory(MAX_MEMORY)
+    games = VecSnakeGame(n_envs, seed=seed)
+    states = agent.get_states(games)
+    next_states = torch.empty_like(states)
+    recent = deque(maxlen=window)
+    n_games = 0
+
+    start = time.perf_counter()
+    while n_games < max_games:
+        moves = agent.select_actions(states, max(0, 80 - n_games))
+        rewards, dones, scores = games.play_step(moves.numpy())
+        agent.get_states(games, out=next_states)
+        memory.push_many(states, moves, rewards, next_states, dones)
+        if len(memory) > BATCH_SIZE:
+            agent.train_step(*memory.sample(BATCH_SIZE))
+
+        for i in np.flatnonzero(dones):
+            n_games += 1
+            recent.append(scores[i])
+            if len(recent) == window and np.mean(recent) >= target_score:
+                return n_games, time.perf_counter() - start
+        states, next_states = next_states, states
+    return None, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Confronto tra rete target, Polyak e Double DQN')
+    parser.add_argument('--target-score', type=float, default=20, help='media da raggiungere')
+    parser.add_argument('--window', type=int, default=100, help='partite su cui calcolare la media')
+    parser.add_argument('--max-games', type=int, default=5000)
+    parser.add_argument('--n-envs', type=int, default=16)
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2])
+    args = parser.parse_args()
+
+    for name, options in VARIANTS.items():
+        ms = time_update(options)
+        results = [games_to_score(options, args.target_score, args.window, args.max_games, args.n_envs, seed)
+                   for seed in args.seeds]
+        reached = [n for n, _ in results if n is not None]
+        median = f'{np.median(reached):8.0f}' if reached else '     n/a'
+        seconds = np.mean([t for _, t in results])
+        print(f'{name:<16} {ms:7.2f} ms/update  games to avg {args.target_score:g}: median {median} '
+              f'({len(reached)}/{len(results)} runs reached it, {seconds:6.1f}s per run)')
@@ -0,0 +1,226 @@
+"""Benchmark dei percorsi caldi del progetto.
+
+Uso, dalla cartella Deep Q-Learning:
+
+    python -m benchmark run --out baseline.json
+    python -m benchmark run --out new.json --suite replay_sample train_step
+    python -m benchmark compare baseline.json new.json --threshold 0.1
+
+`compare` esce con codice 1 se una metrica peggiora oltre la soglia.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+import torch
+
+# SnakeEnv e il ciclo tabellare vivono nella cartella accanto
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Q-Learning'))
+
+from snake_game import SnakeGameAI
+from dqn_agent import DQNAgent
+from replay_memory import ReplayMemory, PrioritizedReplayMemory
+
+MIN_TIME = 1.0  # secondi minimi di misura per ogni metrica
+
+
+def timed(fn, min_time=None):
+    """Chiama fn finche' non passano almeno min_time secondi; restituisce secondi per chiamata."""
+    min_time = min_time or MIN_TIME
+    fn()
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / calls
+
+
+def rate(value, unit):
+    return {'value': value, 'unit': unit, 'higher_is_better': True}
+
+
+def latency(value, unit='us'):
+    return {'value': value, 'unit': unit, 'higher_is_better': False}
+
+
+def random_move():
+    final_move = [0, 0, 0]
+    final_move[random.randint(0, 2)] = 1
+    return final_move
+
+
+def bench_play_step():
+    game = SnakeGameAI(visualize=False, seed=0)
+
+    def step():
+        reward, done, score = game.play_step(random_move())
+        if done:
+            game.reset()
+
+    return {'SnakeGameAI.play_step': rate(1 / timed(step), 'steps/s')}
+
+
+def bench_env_step():
+    from snake_env import SnakeEnv
+    env = SnakeEnv()
+
+    def step():
+        _, _, done, _ = env.step(random.randint(0, 3))
+        if done:
+            env.reset()
+
+    return {'SnakeEnv.step': rate(1 / timed(step), 'steps/s')}
+
+
+def bench_agent():
+    agent = DQNAgent(11, 256, 3, 0.001)
+    game = SnakeGameAI(visualize=False, seed=0)
+    for _ in range(20):
+        if game.play_step(random_move())[1]:
+            game.reset()
+    state = agent.get_state(game)
+
+    return {
+        'DQNAgent.get_state': rate(1 / timed(lambda: agent.get_state(game)), 'calls/s'),
+        'DQNAgent.select_action': rate(1 / timed(lambda: agent.select_action(state, 0)), 'calls/s'),
+        'PolicyCache.rebuild': latency(timed(agent.policy.rebuild) * 1e6),
+    }
+
+
+def fill(memory, n, state_size=11):
+    memory.push_many(torch.rand(n, state_size), torch.randint(0, 3, (n,)), torch.randn(n),
+                     torch.rand(n, state_size), torch.rand(n) < 0.01)
+
+
+def bench_replay_sample(batch_size=1000, capacity=100_000, fill_levels=(2_000, 10_000, 100_000)):
+    results = {}
+    for n in fill_levels:
+        for name, cls in (('uniform', ReplayMemory), ('prioritized', PrioritizedReplayMemory)):
+            memory = cls(capacity)
+            fill(memory, n)
+            seconds = timed(lambda: memory.sample(batch_size))
+            results[f'ReplayMemory.sample[{name},fill={n}]'] = latency(seconds * 1e6)
+    return results
+
+
+def bench_train_step(batch_sizes=(64, 256, 1000, 4096)):
+    agent = DQNAgent(11, 256, 3, 0.001)
+    memory = ReplayMemory(max(batch_sizes) * 4)
+    fill(memory, memory.capacity)
+    results = {}
+    for batch_size in batch_sizes:
+        batch = memory.sample(batch_size)
+        seconds = timed(lambda: agent.train_step(*batch))
+        results[f'DQNAgent.train_step[batch={batch_size}]'] = latency(seconds * 1e3, 'ms')
+    return results
+
+
+def bench_tabular():
+    import train_agent
+    from q_table import new_q_table
+    from snake_env import SnakeEnv
+    env = SnakeEnv()
+    q_table = new_q_table()
+
+    def episode():
+        train_agent.run_dense_episode(env, q_table, 0.5)
+
+    return {'train_agent.run_dense_episode': rate(1 / timed(episode), 'episodes/s')}
+
+
+SUITES = {
+    'play_step': bench_play_step,
+    'env_step': bench_env_step,
+    'agent': bench_agent,
+    'replay_sample': bench_replay_sample,
+    'train_step': bench_train_step,
+    'tabular': bench_tabular,
+}
+
+
+def machine_info():
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+    }
+
+
+def run(suites, out=None, seed=0):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    results = {'machine': machine_info(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'metrics': {}}
+    for name in suites:
+        metrics = SUITES[name]()
+        for metric, value in metrics.items():
+            print(f"{metric:<55} {value['value']:14.2f} {value['unit']}")
+        results['metrics'].update(metrics)
+
+    if out:
+        with open(out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Risultati salvati in {out}')
+    return results
+
+
+def compare(baseline_path, current_path, threshold=0.1):
+    """Stampa le variazioni metrica per metrica; restituisce le regressioni oltre la soglia."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['metrics']
+    with open(current_path) as f:
+        current = json.load(f)['metrics']
+
+    regressions = []
+    for metric in sorted(baseline.keys() & current.keys()):
+        old, new = baseline[metric], current[metric]
+        # Variazione positiva = miglioramento, qualunque sia il verso della metrica
+        change = new['value'] / old['value'] - 1
+        if not old['higher_is_better']:
+            change = old['value'] / new['value'] - 1
+        flag = ''
+        if change < -threshold:
+            flag = 'REGRESSION'
+            regressions.append(metric)
+        print(f"{metric:<55} {old['value']:12.2f} -> {new['value']:12.2f} {new['unit']:<10} {change:+7.1%} {flag}")
+
+    for metric in sorted(baseline.keys() ^ current.keys()):
+        print(f'{metric:<55} presente solo in uno dei due file')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='esegue i benchmark')
+    run_parser.add_argument('--suite', nargs='+', choices=list(SUITES), default=list(SUITES))
+    run_parser.add_argument('--out', help='file JSON dei risultati')
+    run_parser.add_argument('--min-time', type=float, default=MIN_TIME, help='secondi di misura per metrica')
+
+    compare_parser = commands.add_parser('compare', help='confronta due risultati')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='peggioramento tollerato (0.1 = 10%%)')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        MIN_TIME = args.min_time
+        run(args.suite, args.out)
+    else:
+        regressions = compare(args.baseline, args.current, args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regressioni oltre il {args.threshold:.0%}')
+            sys.exit(1)
@@ -0,0 +1,146 @@
+import copy
+import glob
+import os
+import queue
+import random
+import threading
+
+import numpy as np
+import torch
+
+# Attributi di SnakeGameAI legati alla finestra pygame, non salvabili
+UNSAVED = ('display', 'clock')
+
+
+def capture(obj):
+    # Copia profonda degli attributi di un oggetto (partita, replay memory, ...)
+    return {name: copy.deepcopy(value) for name, value in vars(obj).items() if name not in UNSAVED}
+
+
+def restore(obj, state):
+    vars(obj).update(state)
+
+
+def rng_state():
+    return {'random': random.getstate(), 'numpy': np.random.get_state(), 'torch': torch.get_rng_state()}
+
+
+def set_rng_state(state):
+    random.setstate(state['random'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+
+
+def training_state(agent, memory, game, scheduler, **counters):
+    """Fotografa lo stato completo del training; va chiamata dal thread del ciclo.
+
+    La replay memory non viene copiata qui: si prende solo una sua snapshot,
+    copiata poi dal thread di CheckpointManager mentre il ciclo prosegue.
+    """
+    return {
+        'agent': agent.state_dict(),
+        'memory': memory.snapshot() if hasattr(memory, 'snapshot') else capture(memory),
+        'game': capture(game),
+        'scheduler': scheduler.state_dict(),
+        'rng': rng_state(),
+        'counters': counters,
+    }
+
+
+def restore_training(state, agent, memory, game, scheduler):
+    """Ripristina uno stato di training_state; restituisce i contatori salvati."""
+    agent.load_state_dict(state['agent'])
+    if hasattr(memory, 'load_state_dict'):
+        memory.load_state_dict(state['memory'])
+    else:
+        restore(memory, state['memory'])
+    restore(game, state['game'])
+    scheduler.load_state_dict(state['scheduler'])
+    set_rng_state(state['rng'])
+    return state['counters']
+
+
+class CheckpointManager:
+    """Scrive checkpoint completi del training in un thread in background.
+
+    Ogni file viene scritto con un nome temporaneo e rinominato, cosi' un
+    crash a meta' scrittura non lascia checkpoint corrotti. Si tengono solo
+    gli ultimi `keep` checkpoint, i piu' recenti per data di modifica: dopo
+    un resume da un checkpoint vecchio, quelli della corsa abbandonata sono i
+    primi a essere eliminati. `save` non aspetta mai il thread.
+    """
+
+    def __init__(self, directory='checkpoints', keep=3):
+        self.directory = directory
+        self.keep = keep
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def path(self, step):
+        return os.path.join(self.directory, f'checkpoint_{step:09d}.pt')
+
+    def checkpoints(self):
+        # Dal meno al piu' recente; a parita' di data conta il passo nel nome
+        paths = glob.glob(os.path.join(self.directory, 'checkpoint_*.pt'))
+        return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+    def latest(self):
+        paths = self.checkpoints()
+        return paths[-1] if paths else None
+
+    def save(self, state, step):
+        # `state` viene da training_state: copia, tranne la snapshot della replay
+        self._put(self._write_checkpoint, state, step)
+
+    def save_weights(self, model, path='model2.pth'):
+        # Come LinearQNet.save, ma la scrittura avviene nel thread
+        self._put(self._write, copy.deepcopy(model.state_dict()), path)
+
+    def load(self, path=None):
+        path = path or self.latest()
+        if path is None:
+            raise FileNotFoundError(f'nessun checkpoint in {self.directory}')
+        return torch.load(path, weights_only=False)
+
+    def wait(self):
+        self.jobs.join()
+        if self.error:
+            raise self.error
+
+    def close(self):
+        self.wait()
+        self.jobs.put(None)
+        self.thread.join()
+
+    def _put(self, fn, *args):
+        if self.error:
+            raise self.error
+        self.jobs.put((fn, args))
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                fn, args = job
+                fn(*args)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.jobs.task_done()
+
+    def _write(self, obj, path):
+        tmp_path = path + '.tmp'
+        torch.save(obj, tmp_path)
+        os.replace(tmp_path, path)
+
+    def _write_checkpoint(self, state, step):
+        if hasattr(state['memory'], 'state_dict'):
+            state = dict(state, memory=state['memory'].state_dict())
+        self._write(state, self.path(step))
+        for old in self.checkpoints()[:-self.keep]:
+            os.remove(old)
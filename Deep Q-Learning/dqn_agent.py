@@ -2,8 +2,14 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import torch.nn.functional as F
+import copy
 import random
 import os
+import numpy as np
+import numpy_policy
+from numpy_policy import N_FEATURES, REACHABLE, state_index
+
+REACHABLE_STATES = torch.from_numpy(numpy_policy.REACHABLE_STATES)
 
 class LinearQNet(nn.Module):
     def __init__(self, input_size, hidden_size, output_size):
@@ -22,12 +28,72 @@ class LinearQNet(nn.Module):
             os.makedirs(model_folder_path)
         torch.save(self.state_dict(), model_folder_path + file_name)
 
+class PolicyCache:
+    """Azione greedy e valori Q del modello per tutti gli stati raggiungibili.
+
+    La tabella si ricalcola con un solo forward a batch, pigramente: dopo ogni
+    `rebuild_every` chiamate a `updated()` (una per train_step) o dopo
+    `invalidate()` viene segnata come vecchia e ricostruita alla prima lettura.
+    """
+
+    def __init__(self, model, rebuild_every=1):
+        self.model = model
+        self.rebuild_every = rebuild_every
+        self.updates = 0
+        self.stale = True
+        # Indicizzate con state_index; gli stati irraggiungibili restano a zero
+        self.actions = np.zeros(1 << N_FEATURES, dtype=np.int64)
+        self.q_values = np.zeros((1 << N_FEATURES, 3), dtype=np.float32)
+
+    def rebuild(self):
+        with torch.inference_mode():
+            q_values = self.model(REACHABLE_STATES).numpy()
+        self.q_values[REACHABLE] = q_values
+        self.actions[REACHABLE] = q_values.argmax(axis=1)
+        self.stale = False
+
+    def updated(self):
+        self.updates += 1
+        if self.updates % self.rebuild_every == 0:
+            self.stale = True
+
+    def invalidate(self):
+        # Da chiamare quando i pesi cambiano fuori da train_step, es. load_state_dict
+        self.stale = True
+
+    def action(self, index):
+        if self.stale:
+            self.rebuild()
+        return int(self.actions[index])
+
+    def batch_actions(self, indices):
+        if self.stale:
+            self.rebuild()
+        return self.actions[indices]
+
 class DQNAgent:
-    def __init__(self, input_size, hidden_size, output_size, lr):
+    def __init__(self, input_size, hidden_size, output_size, lr, target_update=0, tau=None, double=False,
+                 cache_every=1):
         self.model = LinearQNet(input_size, hidden_size, output_size)
+        self.policy = PolicyCache(self.model, cache_every)
         self.optimizer = optim.Adam(self.model.parameters(), lr=lr)
         self.gamma = 0.9
 
+        # Rete target opzionale: copiata ogni target_update passi oppure, con
+        # tau, avvicinata al modello a ogni passo (media di Polyak). Senza,
+        # i target si calcolano dal modello stesso come prima.
+        if double and not (target_update or tau):
+            # Senza rete target scelta e valutazione userebbero lo stesso modello: DQN normale
+            raise ValueError('double richiede una rete target (target_update o tau)')
+        self.target_update = target_update
+        self.tau = tau
+        self.double = double
+        self.updates = 0
+        self.target_model = None
+        if target_update or tau:
+            self.target_model = copy.deepcopy(self.model)
+            self.target_model.requires_grad_(False)
+
     def get_state(self, game):
         head = game.snake[0]
         point_l = [head[0] - game.block_size, head[1]]
@@ -74,47 +140,110 @@ class DQNAgent:
 
         return torch.tensor(state, dtype=torch.float)
 
+    def get_states(self, games, out=None):
+        """Same 11 features as get_state for every board of a VecSnakeGame.
+
+        Writes into `out` (an (n_envs, 11) float tensor) when given, so the
+        caller can keep reusing preallocated buffers.
+        """
+        if out is None:
+            out = torch.empty((games.n_envs, 11), dtype=torch.float)
+        numpy_policy.vec_states(games, out.numpy())
+        return out
+
     def select_action(self, state, epsilon):
         if random.uniform(0, 1) < epsilon:
             move = random.randint(0, 2)
             final_move = [0, 0, 0]
             final_move[move] = 1
         else:
-            state0 = state.unsqueeze(0)
-            prediction = self.model(state0)
-            move = torch.argmax(prediction).item()
+            move = self.policy.action(state_index(state))
             final_move = [0, 0, 0]
             final_move[move] = 1
         return final_move
 
+    def select_actions(self, states, epsilon):
+        # Versione a batch di select_action: restituisce indici di azione
+        moves = torch.from_numpy(self.policy.batch_actions(state_index(states)))
+        explore = torch.rand(len(moves)) < epsilon
+        moves[explore] = torch.randint(0, 3, (int(explore.sum()),))
+        return moves
 
-    def train_step(self, state, action, reward, next_state, done):
-        # Impila gli stati
-        state = torch.stack(state)
-        next_state = torch.stack(next_state)
-        action = torch.tensor(action, dtype=torch.float)
-        reward = torch.tensor(reward, dtype=torch.float)
-        done = torch.tensor(done, dtype=torch.bool)
+
+    def train_step(self, state, action, reward, next_state, done, weights=None):
+        # Colonne gia' impilate da ReplayMemory.sample, azioni come indici
+        state = torch.as_tensor(state, dtype=torch.float)
+        next_state = torch.as_tensor(next_state, dtype=torch.float)
+        action = torch.as_tensor(action, dtype=torch.long)
+        reward = torch.as_tensor(reward, dtype=torch.float)
+        done = torch.as_tensor(done, dtype=torch.bool)
 
         # Predizioni del modello per lo stato corrente
         pred = self.model(state)  # Shape: [batch_size, output_size]
 
         # Ottieni i valori Q per le azioni intraprese
-        action_indices = torch.argmax(action, dim=1).unsqueeze(1)
+        action_indices = action.unsqueeze(1)
         pred = pred.gather(1, action_indices)  # Shape: [batch_size, 1]
 
-        # Predizioni per lo stato successivo
-        next_pred = self.model(next_state)
-        max_next_pred = torch.max(next_pred, dim=1)[0]
+        # Valore dello stato successivo, senza grafo per il backward
+        with torch.inference_mode():
+            max_next_pred = self.next_values(next_state)
 
         # Calcola il target Q value
         target = reward + self.gamma * max_next_pred * (~done)
         target = target.unsqueeze(1)  # Shape: [batch_size, 1]
 
-        # Ottimizzazione del modello
+        # Ottimizzazione del modello, pesata se il replay e' prioritizzato
+        td_error = target - pred
         self.optimizer.zero_grad()
-        loss = F.mse_loss(pred, target)
+        if weights is None:
+            loss = F.mse_loss(pred, target)
+        else:
+            loss = (torch.as_tensor(weights).unsqueeze(1) * td_error.pow(2)).mean()
         loss.backward()
         self.optimizer.step()
-
-
+        self.update_target()
+        self.policy.updated()
+
+        # Errori TD da usare come nuove priorita'
+        return td_error.detach().squeeze(1)
+
+    def next_values(self, next_state):
+        target_model = self.target_model or self.model
+        if self.double:
+            # Double DQN: l'azione la sceglie il modello, il valore la rete target
+            best = torch.argmax(self.model(next_state), dim=1, keepdim=True)
+            return target_model(next_state).gather(1, best).squeeze(1)
+        return torch.max(target_model(next_state), dim=1)[0]
+
+    def update_target(self):
+        self.updates += 1
+        if self.target_model is None:
+            return
+        if self.tau:
+            with torch.no_grad():
+                for target, param in zip(self.target_model.parameters(), self.model.parameters()):
+                    target.lerp_(param, self.tau)
+        elif self.updates % self.target_update == 0:
+            self.target_model.load_state_dict(self.model.state_dict())
+
+    def state_dict(self):
+        # Copia di tutto lo stato di training: pesi, ottimizzatore, rete target e PolicyCache
+        state = {
+            'model': self.model.state_dict(),
+            'optimizer': self.optimizer.state_dict(),
+            'updates': self.updates,
+            'policy': {'updates': self.policy.updates, 'stale': self.policy.stale,
+                       'actions': self.policy.actions, 'q_values': self.policy.q_values},
+        }
+        if self.target_model is not None:
+            state['target_model'] = self.target_model.state_dict()
+        return copy.deepcopy(state)
+
+    def load_state_dict(self, state):
+        self.model.load_state_dict(state['model'])
+        self.optimizer.load_state_dict(state['optimizer'])
+        self.updates = state['updates']
+        if self.target_model is not None:
+            self.target_model.load_state_dict(state['target_model'])
+        vars(self.policy).update(state['policy'])
@@ -0,0 +1,199 @@
+"""Archivio compatto delle partite: solo seed e sequenza di azioni.
+
+Con il generatore proprio di SnakeGameAI e SnakeEnv, seed e azioni bastano a
+ricostruire ogni passo, quindi una partita costa 12 byte piu' un byte per mossa.
+
+Formato del file: una riga magica, una riga JSON con il tipo di gioco e poi,
+in append, un record per partita: seed (int64), numero di passi (uint32) e le
+azioni come uint8. Un record troncato in coda (es. dopo un crash) si ignora.
+
+    python episode_log.py info games.log
+    python episode_log.py play games.log --episode 3
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b'SNAKELOG 1\n'
+RECORD = struct.Struct('<qI')  # seed, passi
+KEYFRAME_EVERY = 256  # passi tra due copie della partita tenute dal Replayer
+
+
+class EpisodeWriter:
+    """Aggiunge partite a un file di log; il file si apre una volta e resta in append."""
+
+    def __init__(self, path, env='snake_game'):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new_file:
+            with open(path, 'rb') as f:
+                header = read_header(f)
+            if header['env'] != env:
+                raise ValueError(f"{path} contiene partite di {header['env']}, non di {env}")
+        self.file = open(path, 'ab')
+        if new_file:
+            self.file.write(MAGIC + json.dumps({'env': env}).encode() + b'\n')
+        self.seeds = random.Random()
+        self.seed = None
+        self.actions = bytearray()
+
+    def begin(self, seed=None):
+        # Restituisce il seed con cui va resettata la partita
+        self.seed = self.seeds.getrandbits(63) if seed is None else seed
+        self.actions.clear()
+        return self.seed
+
+    def record(self, action):
+        # Fuori da begin()/end(), es. a meta' della partita ripresa da un checkpoint, non registra nulla
+        if self.seed is not None:
+            self.actions.append(action)
+
+    def end(self):
+        if self.seed is not None:
+            self.file.write(RECORD.pack(self.seed, len(self.actions)) + self.actions)
+            self.file.flush()
+        self.seed = None
+
+    def close(self):
+        self.file.close()
+
+
+def read_header(f):
+    if f.readline() != MAGIC:
+        raise ValueError(f'{f.name}: non e\' un log di partite')
+    return json.loads(f.readline())
+
+
+def read_log(path):
+    """Restituisce (header, [(seed, azioni uint8), ...]); le azioni sono viste sul buffer letto."""
+    with open(path, 'rb') as f:
+        header = read_header(f)
+        data = f.read()
+    episodes = []
+    offset = 0
+    while offset + RECORD.size <= len(data):
+        seed, n = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if offset + n > len(data):
+            break
+        episodes.append((seed, np.frombuffer(data, dtype=np.uint8, count=n, offset=offset)))
+        offset += n
+    return header, episodes
+
+
+def make_game(env, seed, visualize=False):
+    if env == 'snake_game':
+        from snake_game import SnakeGameAI
+        return SnakeGameAI(visualize=visualize, seed=seed)
+    if env == 'snake_env':
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Q-Learning'))
+        from snake_env import SnakeEnv
+        return SnakeEnv(seed=seed)
+    raise ValueError(f'gioco sconosciuto: {env}')
+
+
+def apply_action(game, action):
+    # SnakeGameAI vuole la mossa one-hot, SnakeEnv l'indice; restituisce done
+    if hasattr(game, 'play_step'):
+        move = [0, 0, 0]
+        move[action] = 1
+        return game.play_step(move)[1]
+    return game.step(int(action))[2]
+
+
+def board(game):
+    """Griglia uint8 della partita: 0 vuoto, 1 corpo, 2 testa, 3 cibo."""
+    cell = getattr(game, 'block_size', None) or game.cell_size
+    width = getattr(game, 'w', None) or game.width
+    height = getattr(game, 'h', None) or game.height
+    grid = np.zeros((-(-height // cell), -(-width // cell)), dtype=np.uint8)
+    rows, columns = grid.shape
+    for i, (x, y) in enumerate(game.snake):
+        x, y = int(x) // cell, int(y) // cell
+        if 0 <= x < columns and 0 <= y < rows:
+            grid[y, x] = 2 if i == 0 else 1
+    grid[int(game.food[1]) // cell, int(game.food[0]) // cell] = 3
+    return grid
+
+
+class Replayer:
+    """Ricostruisce una partita del log a qualunque passo.
+
+    Alla prima richiesta rigioca la partita una volta tenendo una copia ogni
+    KEYFRAME_EVERY passi; poi `game_at(t)` parte dalla copia piu' vicina e
+    rigioca al massimo KEYFRAME_EVERY - 1 azioni.
+    """
+
+    def __init__(self, env, seed, actions):
+        self.env = env
+        self.seed = seed
+        self.actions = actions
+        self.keyframes = None
+
+    def __len__(self):
+        return len(self.actions)
+
+    def _build_keyframes(self):
+        game = make_game(self.env, self.seed)
+        self.keyframes = [copy.deepcopy(game)]
+        for t in range(KEYFRAME_EVERY, len(self.actions) + 1, KEYFRAME_EVERY):
+            for action in self.actions[t - KEYFRAME_EVERY:t]:
+                apply_action(game, action)
+            self.keyframes.append(copy.deepcopy(game))
+
+    def game_at(self, t):
+        """Copia della partita dopo le prime t azioni (t=0: appena resettata)."""
+        if not 0 <= t <= len(self.actions):
+            raise IndexError(f'passo {t} fuori dalla partita di {len(self.actions)} passi')
+        if self.keyframes is None:
+            self._build_keyframes()
+        start = t // KEYFRAME_EVERY * KEYFRAME_EVERY
+        game = copy.deepcopy(self.keyframes[start // KEYFRAME_EVERY])
+        for action in self.actions[start:t]:
+            apply_action(game, action)
+        return game
+
+    def board(self, t):
+        return board(self.game_at(t))
+
+    def state(self, t):
+        # Osservazione vista dall'agente al passo t
+        game = self.game_at(t)
+        if self.env == 'snake_env':
+            return game._get_observation()
+        from numpy_policy import game_state
+        return game_state(game)
+
+
+def play(header, seed, actions):
+    # Rigioca a schermo: SnakeGameAI disegna da se' in play_step, SnakeEnv con render()
+    game = make_game(header['env'], seed, visualize=True)
+    for action in actions:
+        apply_action(game, action)
+        if header['env'] == 'snake_env':
+            game.render()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    info_parser = commands.add_parser('info', help='riassunto del log')
+    info_parser.add_argument('log')
+    play_parser = commands.add_parser('play', help='rigioca una partita a schermo')
+    play_parser.add_argument('log')
+    play_parser.add_argument('--episode', type=int, default=-1, help='indice della partita, -1 = l\'ultima')
+    args = parser.parse_args()
+
+    header, episodes = read_log(args.log)
+    if args.command == 'info':
+        steps = sum(len(actions) for _, actions in episodes)
+        size = os.path.getsize(args.log)
+        print(f"{header['env']}: {len(episodes)} partite, {steps} passi, {size} byte "
+              f"({size / max(steps, 1):.2f} byte per passo)")
+    else:
+        play(header, *episodes[args.episode])
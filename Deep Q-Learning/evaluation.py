@@ -0,0 +1,42 @@
+"""Valutazione greedy periodica del modello DQN in un processo separato.
+
+Il meccanismo generico (processo 'spawn', coda che tiene solo la copia piu'
+recente, CSV dei risultati) e' BackgroundEvaluator di Q-Learning/background_eval.py,
+condiviso con il training tabellare. Qui ci sono la partita del DQN, giocata
+con NumpyPolicy sugli array dei pesi, e i messaggi in italiano.
+"""
+import os
+import sys
+
+# Il valutatore generico vive nella cartella accanto e richiede solo NumPy
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Q-Learning'))
+
+import background_eval
+from numpy_policy import NumpyPolicy, play_greedy
+
+EVAL_EVERY = 0  # partite di training tra due valutazioni, 0 = nessuna valutazione
+EVAL_GAMES = 100  # partite greedy per valutazione
+EVAL_SEED = 0
+EVAL_OUT = 'eval.csv'
+
+
+def snapshot_model(model):
+    # Pesi di LinearQNet come array NumPy, da passare al processo di valutazione
+    return {name: tensor.detach().cpu().numpy().copy() for name, tensor in model.state_dict().items()}
+
+
+def play_dqn(weights, n_games, seed):
+    """Gioca n_games partite greedy, una per tavolo; restituisce (punteggi, lunghezze)."""
+    return play_greedy(NumpyPolicy(weights).act_batch, n_games, seed=seed)
+
+
+class BackgroundEvaluator(background_eval.BackgroundEvaluator):
+    """background_eval.BackgroundEvaluator con i valori predefiniti del DQN."""
+
+    def __init__(self, play=play_dqn, every=EVAL_EVERY, n_games=EVAL_GAMES, seed=EVAL_SEED, out=EVAL_OUT):
+        super().__init__(play, every, n_games, seed, out)
+
+    def report(self, row):
+        print(f"Valutazione a {row['games']} partite: punteggio media {row['score_mean']:.2f} "
+              f"mediana {row['score_median']:.0f} max {row['score_max']}  "
+              f"lunghezza media {row['length_mean']:.0f} mediana {row['length_median']:.0f} max {row['length_max']}")
@@ -1,56 +1,323 @@
+import argparse
+import time
 import torch
 import random
 import numpy as np
 from snake_game import SnakeGameAI
+from vec_snake_game import VecSnakeGame
 from dqn_agent import DQNAgent
-from replay_memory import ReplayMemory
+from replay_memory import ReplayMemory, PrioritizedReplayMemory, MemmapReplayMemory
+from profiling import PhaseProfiler
+from checkpoint import CheckpointManager, training_state, restore_training
+from episode_log import EpisodeWriter
+from evaluation import BackgroundEvaluator, snapshot_model, EVAL_EVERY, EVAL_GAMES, EVAL_OUT
 
 MAX_MEMORY = 100_000
 BATCH_SIZE = 1000
 LR = 0.01 #rifare training con 0.01
+PRIORITIZED = False  # replay prioritizzato con sum-tree
+REPLAY_DIR = None  # se impostata, replay su file memmap in questa cartella (MemmapReplayMemory)
+N_ENVS = 1  # con N_ENVS > 1 si allena su N partite in parallelo (VecSnakeGame)
+TARGET_UPDATE = 0  # train_step tra due copie nella rete target, 0 = nessuna rete target
+TAU = None  # se impostato, rete target aggiornata a ogni passo con media di Polyak
+DOUBLE_DQN = False
+CACHE_EVERY = 1  # train_step tra due ricostruzioni della PolicyCache
+WARMUP = BATCH_SIZE  # passi dell'ambiente prima del primo train_step
+TRAIN_EVERY = 1  # passi del ciclo tra due aggiornamenti
+UPDATES_PER_STEP = 1  # train_step a ogni aggiornamento
+MAX_STEPS = None  # budget di transizioni, None = senza limite
+MAX_SECONDS = None  # budget di tempo, None = senza limite
+CHECKPOINT_DIR = 'checkpoints'
+CHECKPOINT_EVERY = 100  # partite tra due checkpoint completi
+KEEP_CHECKPOINTS = 3
+EPISODE_LOG = None  # se impostato, ogni partita di train() viene archiviata come seed + azioni
 
-def train():
+class UpdateScheduler:
+    """Decide quanti train_step fare dopo ogni passo del ciclo di training.
+
+    Nessun aggiornamento finche' non si sono raccolte `warmup` transizioni,
+    poi `updates_per_step` train_step ogni `train_every` passi. Con train_vec
+    un passo muove tutte le partite insieme e conta n_envs transizioni.
+    `done()` diventa vero quando si esaurisce il budget di transizioni o di secondi.
+    """
+
+    def __init__(self, warmup=WARMUP, train_every=TRAIN_EVERY, updates_per_step=UPDATES_PER_STEP,
+                 max_steps=MAX_STEPS, max_seconds=MAX_SECONDS):
+        if train_every < 1:
+            raise ValueError(f'train_every deve essere almeno 1, non {train_every}')
+        self.warmup = warmup
+        self.train_every = train_every
+        self.updates_per_step = updates_per_step
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.env_steps = 0
+        self.iterations = 0
+        self.start = time.perf_counter()
+
+    def step(self, n_envs=1):
+        # Restituisce il numero di train_step da fare dopo questo passo
+        self.env_steps += n_envs
+        self.iterations += 1
+        if self.env_steps <= self.warmup or self.iterations % self.train_every:
+            return 0
+        return self.updates_per_step
+
+    def state_dict(self):
+        # Solo i contatori: warmup e budget vengono dalla configurazione corrente
+        return {'env_steps': self.env_steps, 'iterations': self.iterations,
+                'elapsed': time.perf_counter() - self.start}
+
+    def load_state_dict(self, state):
+        self.env_steps = state['env_steps']
+        self.iterations = state['iterations']
+        self.start = time.perf_counter() - state['elapsed']
+
+    def done(self):
+        if self.max_steps is not None and self.env_steps >= self.max_steps:
+            return True
+        return self.max_seconds is not None and time.perf_counter() - self.start >= self.max_seconds
+
+def new_agent():
+    return DQNAgent(11, 256, 3, LR, target_update=TARGET_UPDATE, tau=TAU, double=DOUBLE_DQN,
+                    cache_every=CACHE_EVERY)
+
+def new_memory():
+    if REPLAY_DIR:
+        if PRIORITIZED:
+            raise ValueError('il replay prioritizzato non supporta ancora REPLAY_DIR')
+        return MemmapReplayMemory(REPLAY_DIR, MAX_MEMORY)
+    return PrioritizedReplayMemory(MAX_MEMORY) if PRIORITIZED else ReplayMemory(MAX_MEMORY)
+
+def learn(agent, memory, profiler):
+    if PRIORITIZED:
+        with profiler.phase('replay_sample'):
+            *batch, weights, idx = memory.sample(BATCH_SIZE)
+        with profiler.phase('train_step'):
+            td_errors = agent.train_step(*batch, weights=weights)
+        with profiler.phase('priority_update'):
+            memory.update_priorities(idx, td_errors)
+    else:
+        with profiler.phase('replay_sample'):
+            states, actions, rewards, next_states, dones = memory.sample(BATCH_SIZE)
+        with profiler.phase('train_step'):
+            agent.train_step(states, actions, rewards, next_states, dones)
+    profiler.count('train_steps')
+
+def positive_int(value):
+    # Tipo argparse per i parametri che devono valere almeno 1
+    value = int(value)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f'deve essere almeno 1, non {value}')
+    return value
+
+def load_checkpoint(checkpoints, resume):
+    # resume e' il percorso di un checkpoint oppure 'latest'
+    return checkpoints.load(None if resume == 'latest' else resume)
+
+def evaluate_if_due(evaluator, n_games, agent):
+    # Copia dei pesi al processo di valutazione ogni evaluator.every partite
+    if evaluator is None:
+        return
+    if evaluator.due(n_games):
+        evaluator.submit(n_games, snapshot_model(agent.model))
+    else:
+        evaluator.poll()
+
+def train(profiler=None, scheduler=None, checkpoints=None, resume=None, episodes=None, evaluator=None):
+    profiler = profiler or PhaseProfiler()
+    scheduler = scheduler or UpdateScheduler()
+    checkpoints = checkpoints or CheckpointManager(CHECKPOINT_DIR, KEEP_CHECKPOINTS)
     total_score = 0
     record = 0
-    agent = DQNAgent(11, 256, 3, LR)
-    memory = ReplayMemory(MAX_MEMORY)
+    agent = new_agent()
+    memory = new_memory()
     n_games = 0
 
+    checkpoint = load_checkpoint(checkpoints, resume) if resume else None
+    if checkpoint:
+        n_games = checkpoint['counters']['n_games']
+    # Una partita ripresa a meta' da un checkpoint non finisce nel log
+    seed = episodes.begin() if episodes and not checkpoint else None
     visualize = (n_games % 1000 == 0)
-    game = SnakeGameAI(visualize=visualize)
+    game = SnakeGameAI(visualize=visualize, seed=seed)
+    if checkpoint:
+        counters = restore_training(checkpoint, agent, memory, game, scheduler)
+        record, total_score = counters['record'], counters['total_score']
+        print('Ripreso da', resume, 'alla partita', n_games)
 
-    while True:
-        state_old = agent.get_state(game)
+    while not scheduler.done():
+        with profiler.phase('get_state'):
+            state_old = agent.get_state(game)
 
         epsilon = max(0, 80 - n_games)
-        final_move = agent.select_action(state_old, epsilon)
+        with profiler.phase('select_action'):
+            final_move = agent.select_action(state_old, epsilon)
 
-        reward, done, score = game.play_step(final_move)
-        state_new = agent.get_state(game)
+        with profiler.phase('env_step'):
+            reward, done, score = game.play_step(final_move)
+        if episodes:
+            episodes.record(final_move.index(1))
+        with profiler.phase('get_state'):
+            state_new = agent.get_state(game)
 
-        memory.push((state_old, final_move, reward, state_new, done))
-
-        if len(memory) > BATCH_SIZE:
-            mini_sample = memory.sample(BATCH_SIZE)
-            states, actions, rewards, next_states, dones = zip(*mini_sample)
-            agent.train_step(states, actions, rewards, next_states, dones)
+        with profiler.phase('replay_push'):
+            memory.push((state_old, final_move, reward, state_new, done))
+        profiler.count('env_steps')
 
+        for _ in range(scheduler.step()):
+            learn(agent, memory, profiler)
 
         if done:
             n_games += 1
             total_score += score
             if score > record:
                 record = score
-                agent.model.save()
+                with profiler.phase('model_save'):
+                    checkpoints.save_weights(agent.model)
             print('Game', n_games, 'Score', score, 'Record:', record)
+            profiler.game_done(n_games)
+            evaluate_if_due(evaluator, n_games, agent)
+
+            if episodes:
+                episodes.end()
+                seed = episodes.begin()
 
             # Determina se visualizzare il prossimo episodio
             new_visualize = (n_games % 1000 == 0)
             if new_visualize != visualize:
                 visualize = new_visualize
-                game = SnakeGameAI(visualize=visualize)
+                game = SnakeGameAI(visualize=visualize, seed=seed)
             else:
-                game.reset()
+                game.reset(seed)
+
+            if n_games % CHECKPOINT_EVERY == 0:
+                with profiler.phase('checkpoint'):
+                    checkpoints.save(training_state(agent, memory, game, scheduler, n_games=n_games, record=record,
+                                                    total_score=total_score), scheduler.env_steps)
+
+    print('Budget esaurito dopo', scheduler.env_steps, 'transizioni e', n_games, 'partite')
+    checkpoints.save(training_state(agent, memory, game, scheduler, n_games=n_games, record=record,
+                                    total_score=total_score), scheduler.env_steps)
+    checkpoints.close()
+    if episodes:
+        episodes.close()
+    if evaluator:
+        evaluator.close()
+    return agent
+
+def train_vec(n_envs=N_ENVS, profiler=None, scheduler=None, checkpoints=None, resume=None, evaluator=None):
+    # Come train(), ma ogni passo muove n_envs partite headless insieme e
+    # inserisce n_envs transizioni nella memoria con un'unica chiamata
+    profiler = profiler or PhaseProfiler()
+    scheduler = scheduler or UpdateScheduler()
+    checkpoints = checkpoints or CheckpointManager(CHECKPOINT_DIR, KEEP_CHECKPOINTS)
+    record = 0
+    agent = new_agent()
+    memory = new_memory()
+    n_games = 0
+
+    games = VecSnakeGame(n_envs)
+    if resume:
+        counters = restore_training(load_checkpoint(checkpoints, resume), agent, memory, games, scheduler)
+        if games.n_envs != n_envs:
+            raise ValueError(f'il checkpoint ha {games.n_envs} partite in parallelo, non {n_envs}')
+        n_games, record = counters['n_games'], counters['record']
+        print('Ripreso da', resume, 'alla partita', n_games)
+    next_checkpoint = (n_games // CHECKPOINT_EVERY + 1) * CHECKPOINT_EVERY
+    states = agent.get_states(games)
+    next_states = torch.empty_like(states)
+
+    while not scheduler.done():
+        epsilon = max(0, 80 - n_games)
+        with profiler.phase('select_action'):
+            moves = agent.select_actions(states, epsilon)
+
+        with profiler.phase('env_step'):
+            rewards, dones, scores = games.play_step(moves.numpy())
+        with profiler.phase('get_state'):
+            agent.get_states(games, out=next_states)
+
+        with profiler.phase('replay_push'):
+            memory.push_many(states, moves, rewards, next_states, dones)
+        profiler.count('env_steps', n_envs)
+
+        for _ in range(scheduler.step(n_envs)):
+            learn(agent, memory, profiler)
+
+        for i in np.flatnonzero(dones):
+            n_games += 1
+            if scores[i] > record:
+                record = scores[i]
+                with profiler.phase('model_save'):
+                    checkpoints.save_weights(agent.model)
+            print('Game', n_games, 'Score', scores[i], 'Record:', record)
+            profiler.game_done(n_games)
+            evaluate_if_due(evaluator, n_games, agent)
+
+        states, next_states = next_states, states
+
+        if n_games >= next_checkpoint:
+            with profiler.phase('checkpoint'):
+                checkpoints.save(training_state(agent, memory, games, scheduler, n_games=n_games, record=record),
+                                 scheduler.env_steps)
+            next_checkpoint = (n_games // CHECKPOINT_EVERY + 1) * CHECKPOINT_EVERY
+
+    print('Budget esaurito dopo', scheduler.env_steps, 'transizioni e', n_games, 'partite')
+    checkpoints.save(training_state(agent, memory, games, scheduler, n_games=n_games, record=record),
+                     scheduler.env_steps)
+    checkpoints.close()
+    if evaluator:
+        evaluator.close()
+    return agent
 
 if __name__ == '__main__':
-    train()
+    parser = argparse.ArgumentParser(description='Training DQN di Snake')
+    parser.add_argument('--n-envs', type=int, default=N_ENVS, help='partite in parallelo (VecSnakeGame) se > 1')
+    parser.add_argument('--profile', action='store_true', help='attiva timer e contatori per fase')
+    parser.add_argument('--profile-every', type=int, default=100, help='partite tra due scritture delle statistiche')
+    parser.add_argument('--profile-out', default='profile.csv', help='file CSV, o testo Prometheus se finisce in .prom')
+    parser.add_argument('--profile-window', type=int, nargs=2, metavar=('START', 'STOP'),
+                        help='cattura un profilo tra queste due partite')
+    parser.add_argument('--profiler', choices=['cprofile', 'torch'], default='cprofile')
+    parser.add_argument('--target-update', type=int, default=TARGET_UPDATE,
+                        help='train_step tra due sincronizzazioni della rete target (0 = nessuna)')
+    parser.add_argument('--tau', type=float, default=TAU, help='aggiornamento Polyak della rete target a ogni passo')
+    parser.add_argument('--double', action='store_true', default=DOUBLE_DQN, help='target Double DQN')
+    parser.add_argument('--cache-every', type=int, default=CACHE_EVERY,
+                        help='train_step tra due ricostruzioni della tabella delle azioni greedy')
+    parser.add_argument('--warmup', type=int, default=WARMUP, help='transizioni raccolte prima del primo train_step')
+    parser.add_argument('--train-every', type=positive_int, default=TRAIN_EVERY, help='passi del ciclo tra due aggiornamenti')
+    parser.add_argument('--updates-per-step', type=int, default=UPDATES_PER_STEP, help='train_step per aggiornamento')
+    parser.add_argument('--max-steps', type=int, default=MAX_STEPS, help='ferma il training dopo tante transizioni')
+    parser.add_argument('--max-seconds', type=float, default=MAX_SECONDS, help='ferma il training dopo tanti secondi')
+    parser.add_argument('--replay-dir', default=REPLAY_DIR, help='tiene la replay memory su file memmap in questa cartella')
+    parser.add_argument('--max-memory', type=int, default=MAX_MEMORY, help='capacita\' della replay memory')
+    parser.add_argument('--episode-log', default=EPISODE_LOG, help='archivia seed e azioni di ogni partita (solo train())')
+    parser.add_argument('--eval-every', type=int, default=EVAL_EVERY,
+                        help='partite tra due valutazioni greedy in un processo separato (0 = nessuna)')
+    parser.add_argument('--eval-games', type=int, default=EVAL_GAMES, help='partite greedy con seed fisso per valutazione')
+    parser.add_argument('--eval-out', default=EVAL_OUT, help='CSV in cui aggiungere i risultati delle valutazioni')
+    parser.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR)
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY, help='partite tra due checkpoint')
+    parser.add_argument('--keep', type=int, default=KEEP_CHECKPOINTS, help='checkpoint da conservare')
+    parser.add_argument('--resume', nargs='?', const='latest',
+                        help='riprende dall\'ultimo checkpoint, o da quello indicato')
+    args = parser.parse_args()
+    if args.double and not (args.target_update or args.tau):
+        parser.error('--double richiede una rete target: --target-update o --tau')
+
+    TARGET_UPDATE, TAU, DOUBLE_DQN, CACHE_EVERY = args.target_update, args.tau, args.double, args.cache_every
+    CHECKPOINT_EVERY = args.checkpoint_every
+    REPLAY_DIR, MAX_MEMORY = args.replay_dir, args.max_memory
+    checkpoints = CheckpointManager(args.checkpoint_dir, args.keep)
+    scheduler = UpdateScheduler(args.warmup, args.train_every, args.updates_per_step, args.max_steps, args.max_seconds)
+
+    profiler = PhaseProfiler(args.profile, args.profile_every, args.profile_out, args.profile_window, args.profiler)
+    evaluator = None
+    if args.eval_every:
+        evaluator = BackgroundEvaluator(every=args.eval_every, n_games=args.eval_games, out=args.eval_out)
+    if args.n_envs > 1:
+        train_vec(args.n_envs, profiler, scheduler, checkpoints, args.resume, evaluator)
+    else:
+        episodes = EpisodeWriter(args.episode_log) if args.episode_log else None
+        train(profiler, scheduler, checkpoints, args.resume, episodes, evaluator)
@@ -0,0 +1,160 @@
+"""Inferenza del modello DQN con sola NumPy, senza importare torch.
+
+Esportazione dei pesi, una volta sola (questa parte richiede torch):
+
+    python numpy_policy.py model2.pth            # scrive model2.npz
+"""
+import numpy as np
+from vec_snake_game import DIR_DX, DIR_DY, VecSnakeGame
+
+# Per ogni direzione (0: right, 1: left, 2: up, 3: down) la direzione che sta
+# alla sua destra e alla sua sinistra, come nei termini "danger" di get_state
+RIGHT_OF = np.array([3, 2, 0, 1])
+LEFT_OF = np.array([2, 3, 1, 0])
+
+# Le 11 feature di get_state sono binarie: ogni stato e' un intero a 11 bit.
+# Se ne possono presentare solo 288: una sola direzione attiva e il cibo mai
+# contemporaneamente a sinistra e a destra, o sopra e sotto.
+N_FEATURES = 11
+STATE_BITS = 1 << np.arange(N_FEATURES)
+_bits = (np.arange(1 << N_FEATURES)[:, None] & STATE_BITS) > 0
+REACHABLE = np.flatnonzero((_bits[:, 3:7].sum(axis=1) == 1) & ~(_bits[:, 7] & _bits[:, 8]) & ~(_bits[:, 9] & _bits[:, 10]))
+REACHABLE_STATES = _bits[REACHABLE].astype(np.float32)
+
+
+def state_index(states):
+    # Intero a 11 bit di uno stato (11,) o di un batch (n, 11)
+    return np.asarray(states).astype(np.int64) @ STATE_BITS
+
+
+def game_state(game, out=None):
+    """Le stesse 11 feature di DQNAgent.get_state, come array float32."""
+    if out is None:
+        out = np.empty(N_FEATURES, dtype=np.float32)
+    x, y = game.snake[0]
+    b = game.block_size
+    d = game.direction
+    # Collisione nelle quattro celle vicine, ordinate per direzione
+    collision = (game.is_collision([x + b, y]), game.is_collision([x - b, y]),
+                 game.is_collision([x, y - b]), game.is_collision([x, y + b]))
+    out[0] = collision[d]            # Danger straight
+    out[1] = collision[RIGHT_OF[d]]  # Danger right
+    out[2] = collision[LEFT_OF[d]]   # Danger left
+    out[3] = d == 1
+    out[4] = d == 0
+    out[5] = d == 2
+    out[6] = d == 3
+    out[7] = game.food[0] < game.head[0]
+    out[8] = game.food[0] > game.head[0]
+    out[9] = game.food[1] < game.head[1]
+    out[10] = game.food[1] > game.head[1]
+    return out
+
+
+def vec_states(games, out=None):
+    """Le 11 feature per ogni partita di un VecSnakeGame, in un array (n_envs, 11)."""
+    if out is None:
+        out = np.empty((games.n_envs, N_FEATURES), dtype=np.float32)
+    ids = games.env_ids
+    head_x = games.head[:, 0]
+    head_y = games.head[:, 1]
+
+    # Collisione nelle quattro celle vicine, colonne ordinate per direzione
+    x = head_x[:, None] + DIR_DX
+    y = head_y[:, None] + DIR_DY
+    out_of_board = (x < 0) | (x >= games.grid_w) | (y < 0) | (y >= games.grid_h)
+    cells = np.where(out_of_board, 0, y * games.grid_w + x)
+    collision = out_of_board | games.occupied[ids[:, None], cells]
+
+    direction = games.direction
+    out[:, 0] = collision[ids, direction]            # Danger straight
+    out[:, 1] = collision[ids, RIGHT_OF[direction]]  # Danger right
+    out[:, 2] = collision[ids, LEFT_OF[direction]]   # Danger left
+    out[:, 3] = direction == 1
+    out[:, 4] = direction == 0
+    out[:, 5] = direction == 2
+    out[:, 6] = direction == 3
+    out[:, 7] = games.food[:, 0] < head_x
+    out[:, 8] = games.food[:, 0] > head_x
+    out[:, 9] = games.food[:, 1] < head_y
+    out[:, 10] = games.food[:, 1] > head_y
+    return out
+
+
+def play_greedy(act_batch, n_games, n_envs=1000, seed=None):
+    """Gioca n_games partite con act_batch(stati) -> azioni; restituisce (punteggi, lunghezze).
+
+    Ogni tavolo gioca una sola partita, fino alla fine: tenere le prime
+    n_games partite concluse su piu' tavoli premierebbe quelle brevi. Oltre
+    n_envs partite si gioca a gruppi di n_envs tavoli (seed, seed + 1, ...).
+    """
+    scores = np.empty(n_games, dtype=np.int64)
+    lengths = np.zeros(n_games, dtype=np.int64)
+    for k, first in enumerate(range(0, n_games, n_envs)):
+        n = min(n_envs, n_games - first)
+        games = VecSnakeGame(n, seed=None if seed is None else seed + k)
+        states = np.empty((n, N_FEATURES), dtype=np.float32)
+        chunk_scores = scores[first:first + n]
+        chunk_lengths = lengths[first:first + n]
+        running = np.ones(n, dtype=bool)
+
+        # Il limite di SnakeGameAI (100 passi per segmento) chiude anche le partite in loop
+        while running.any():
+            vec_states(games, out=states)
+            _, dones, final_scores = games.play_step(act_batch(states))
+            chunk_lengths[running] += 1
+            finished = running & dones
+            chunk_scores[finished] = final_scores[finished]
+            running &= ~dones
+    return scores, lengths
+
+
+def export_npz(pth_path, npz_path=None):
+    """Scrive i pesi di un LinearQNet salvato con torch in un .npz; restituisce il percorso."""
+    import torch
+
+    npz_path = npz_path or pth_path.rsplit('.', 1)[0] + '.npz'
+    state_dict = torch.load(pth_path, map_location='cpu')
+    np.savez(npz_path, **{name: tensor.numpy() for name, tensor in state_dict.items()})
+    return npz_path
+
+
+class NumpyPolicy:
+    """LinearQNet 11 -> 256 -> 3 in NumPy, caricato da un .npz di export_npz.
+
+    `forward` lavora a batch; `act` e `act_batch` leggono l'azione greedy da
+    una tabella calcolata al caricamento per tutti gli stati raggiungibili.
+    """
+
+    def __init__(self, path='model2.npz'):
+        # Al posto del percorso va bene anche un dizionario {nome: array} come lo state_dict
+        if isinstance(path, dict):
+            self._load(path)
+        else:
+            with np.load(path) as weights:
+                self._load(weights)
+        self.actions = np.zeros(1 << N_FEATURES, dtype=np.int64)
+        self.actions[REACHABLE] = self.forward(REACHABLE_STATES).argmax(axis=1)
+
+    def _load(self, weights):
+        self.w1 = np.ascontiguousarray(weights['linear1.weight'].T)
+        self.b1 = np.asarray(weights['linear1.bias'])
+        self.w2 = np.ascontiguousarray(weights['linear2.weight'].T)
+        self.b2 = np.asarray(weights['linear2.bias'])
+
+    def forward(self, states):
+        hidden = np.maximum(states @ self.w1 + self.b1, 0)
+        return hidden @ self.w2 + self.b2
+
+    def act(self, state):
+        return int(self.actions[state_index(state)])
+
+    def act_batch(self, states):
+        return self.actions[state_index(states)]
+
+
+if __name__ == '__main__':
+    import sys
+
+    for path in sys.argv[1:]:
+        print(f'{path} -> {export_npz(path)}')
@@ -0,0 +1,278 @@
+"""Training DQN a pipeline: raccolta delle esperienze e train_step si sovrappongono.
+
+Tre thread lavorano insieme su n_envs partite VecSnakeGame:
+- collector: muove le partite con l'ultima copia pubblicata dei pesi e
+  riempie la replay memory;
+- prefetcher: estrae i mini-batch dalla replay in due buffer preallocati
+  che si alternano (double buffering);
+- learner: fa train_step sul buffer pronto mentre l'altro si riempie e ogni
+  PUBLISH_EVERY passi pubblica una nuova versione dei pesi.
+Le operazioni di torch rilasciano il GIL, quindi il learner avanza mentre il
+collector gioca. Il numero di train_step segue l'UpdateScheduler come in
+train_vec; il collector si ferma se il learner resta indietro di MAX_LAG passi.
+
+    python pipeline.py --n-envs 64 --max-seconds 600
+"""
+import argparse
+import queue
+import threading
+import time
+
+import numpy as np
+import torch
+
+from vec_snake_game import VecSnakeGame
+from dqn_agent import DQNAgent
+from checkpoint import CheckpointManager, training_state, restore_training
+import main
+from main import UpdateScheduler, new_agent, new_memory, load_checkpoint
+
+PUBLISH_EVERY = 50  # train_step tra due versioni dei pesi per il collector
+MAX_LAG = 64  # train_step dovuti al massimo prima che il collector si fermi ad aspettare
+REPORT_EVERY = 10  # secondi tra due righe di utilizzo dei thread
+
+
+class WeightSnapshots:
+    """Ultima copia pubblicata dei pesi del modello, con un numero di versione.
+
+    Una copia non viene mai modificata dopo `publish`: chi la legge vede i
+    pesi di un unico train_step, mai una via di mezzo tra due.
+    """
+
+    def __init__(self, model):
+        self.latest = (0, self._copy(model))
+
+    def _copy(self, model):
+        with torch.no_grad():
+            return {name: tensor.clone() for name, tensor in model.state_dict().items()}
+
+    def publish(self, model):
+        version = self.latest[0] + 1
+        self.latest = (version, self._copy(model))  # Un'unica assegnazione: atomica per chi legge
+        return version
+
+
+class Utilization:
+    """Tempo di lavoro di ogni thread sul tempo trascorso; le attese non contano."""
+
+    def __init__(self, names):
+        self.busy = dict.fromkeys(names, 0.0)
+        self.start = time.perf_counter()
+
+    def add(self, name, start):
+        self.busy[name] += time.perf_counter() - start
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start
+        shares = {name: busy / elapsed for name, busy in self.busy.items()}
+        # Piu' di 1 significa che i thread hanno davvero lavorato insieme
+        overlap = sum(shares.values())
+        return '  '.join(f'{name} {share:6.1%}' for name, share in shares.items()) + f'  somma {overlap:.2f}'
+
+
+class Pipeline:
+    def __init__(self, agent, memory, games, scheduler, checkpoints, batch_size=main.BATCH_SIZE,
+                 publish_every=PUBLISH_EVERY, max_lag=MAX_LAG):
+        self.agent = agent
+        self.memory = memory
+        self.games = games
+        self.scheduler = scheduler
+        self.checkpoints = checkpoints
+        self.batch_size = batch_size
+        self.publish_every = publish_every
+        self.max_lag = max_lag
+
+        # Il collector agisce con una copia dei pesi, come gli attori di actor_learner
+        self.actor = DQNAgent(11, 256, 3, 0)
+        self.snapshots = WeightSnapshots(agent.model)
+        self.actor_version = -1
+
+        # La replay si scrive e si legge da thread diversi: push e sample sotto lock
+        self.memory_lock = threading.Lock()
+        self.free = queue.Queue()
+        self.ready = queue.Queue()
+        for _ in range(2):
+            self.free.put(memory.new_batch(batch_size))
+        # La replay contiene almeno una transizione: sample_into estrae con ripetizione, come
+        # sample in train_vec, quindi non serve aspettare un batch intero (con warmup piccolo e
+        # poche partite il collector si fermerebbe su max_lag prima di arrivarci)
+        self.filled = threading.Event()
+
+        # train_step dovuti secondo lo scheduler e non ancora fatti
+        self.owed = 0
+        self.owed_changed = threading.Condition()
+        self.collecting = True
+
+        self.n_games = 0
+        self.record = 0
+        self.utilization = Utilization(['collector', 'prefetcher', 'learner'])
+        self.error = None
+
+    def refresh_actor(self):
+        version, weights = self.snapshots.latest
+        if version != self.actor_version:
+            self.actor.model.load_state_dict(weights)
+            self.actor.policy.invalidate()
+            self.actor_version = version
+
+    def collect(self):
+        games, scheduler = self.games, self.scheduler
+        states = self.actor.get_states(games)
+        next_states = torch.empty_like(states)
+        last_report = time.perf_counter()
+
+        while not scheduler.done() and self.error is None:
+            start = time.perf_counter()
+            self.refresh_actor()
+            epsilon = max(0, 80 - self.n_games)
+            moves = self.actor.select_actions(states, epsilon)
+            rewards, dones, scores = games.play_step(moves.numpy())
+            self.actor.get_states(games, out=next_states)
+            with self.memory_lock:
+                self.memory.push_many(states, moves, rewards, next_states, dones)
+            self.filled.set()
+
+            for i in np.flatnonzero(dones):
+                self.n_games += 1
+                if scores[i] > self.record:
+                    self.record = scores[i]
+                    # Salva i pesi con cui il collector ha giocato, non quelli a meta' aggiornamento
+                    self.checkpoints.save_weights(self.actor.model)
+                print('Game', self.n_games, 'Score', scores[i], 'Record:', self.record)
+            states, next_states = next_states, states
+            updates = scheduler.step(games.n_envs)
+            self.utilization.add('collector', start)
+
+            with self.owed_changed:
+                self.owed += updates
+                self.owed_changed.notify_all()
+                while self.owed > self.max_lag and self.error is None:
+                    self.owed_changed.wait()
+
+            if time.perf_counter() - last_report >= REPORT_EVERY:
+                print('Utilizzo:', self.utilization.report(), f'pesi v{self.actor_version}')
+                last_report = time.perf_counter()
+
+        with self.owed_changed:
+            self.collecting = False
+            self.owed_changed.notify_all()
+
+    def prefetch(self):
+        self.filled.wait()
+        while True:
+            batch = self.free.get()
+            if batch is None:
+                return
+            start = time.perf_counter()
+            with self.memory_lock:
+                self.memory.sample_into(batch)
+            self.utilization.add('prefetcher', start)
+            self.ready.put(batch)
+
+    def learn(self):
+        while True:
+            with self.owed_changed:
+                while not self.owed and self.collecting:
+                    self.owed_changed.wait()
+                if not self.owed:
+                    return  # Raccolta finita e nessun train_step arretrato
+                self.owed -= 1
+                self.owed_changed.notify_all()
+
+            batch = self.ready.get()
+            if batch is None:
+                return
+            start = time.perf_counter()
+            self.agent.train_step(*batch)
+            if self.agent.updates % self.publish_every == 0:
+                self.snapshots.publish(self.agent.model)
+            self.utilization.add('learner', start)
+            self.free.put(batch)
+
+    def _guard(self, fn):
+        # Un errore in un thread ferma anche gli altri invece di lasciarli in attesa
+        try:
+            fn()
+        except BaseException as e:
+            self.error = e
+            with self.owed_changed:
+                self.collecting = False
+                self.owed = 0
+                self.owed_changed.notify_all()
+            self.filled.set()
+            self.free.put(None)
+            self.ready.put(None)
+
+    def run(self):
+        threads = [threading.Thread(target=self._guard, args=(fn,), name=fn.__name__, daemon=True)
+                   for fn in (self.collect, self.prefetch, self.learn)]
+        for thread in threads:
+            thread.start()
+        threads[0].join()
+        threads[2].join()
+        # Il prefetcher puo' essere fermo su free.get() o su filled.wait()
+        self.filled.set()
+        self.free.put(None)
+        threads[1].join()
+        if self.error:
+            raise self.error
+        print('Utilizzo finale:', self.utilization.report())
+
+
+def train_pipelined(n_envs=64, scheduler=None, checkpoints=None, resume=None, publish_every=PUBLISH_EVERY,
+                    max_lag=MAX_LAG):
+    if main.PRIORITIZED:
+        raise ValueError('il training a pipeline non supporta ancora il replay prioritizzato')
+    scheduler = scheduler or UpdateScheduler()
+    checkpoints = checkpoints or CheckpointManager(main.CHECKPOINT_DIR, main.KEEP_CHECKPOINTS)
+    agent = new_agent()
+    memory = new_memory()
+    games = VecSnakeGame(n_envs)
+
+    pipeline = Pipeline(agent, memory, games, scheduler, checkpoints, publish_every=publish_every, max_lag=max_lag)
+    if resume:
+        # Stesso formato di train_vec: si puo' riprendere l'uno dall'altro
+        counters = restore_training(load_checkpoint(checkpoints, resume), agent, memory, games, scheduler)
+        if games.n_envs != n_envs:
+            raise ValueError(f'il checkpoint ha {games.n_envs} partite in parallelo, non {n_envs}')
+        pipeline.n_games, pipeline.record = counters['n_games'], counters['record']
+        pipeline.snapshots.publish(agent.model)
+        print('Ripreso da', resume, 'alla partita', pipeline.n_games)
+
+    pipeline.run()
+
+    # Checkpoint completo solo a thread fermi, quando lo stato e' coerente
+    print('Budget esaurito dopo', scheduler.env_steps, 'transizioni,', agent.updates, 'train_step e',
+          pipeline.n_games, 'partite')
+    checkpoints.save(training_state(agent, memory, games, scheduler, n_games=pipeline.n_games,
+                                    record=pipeline.record), scheduler.env_steps)
+    checkpoints.close()
+    return agent
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--n-envs', type=int, default=64, help='partite mosse insieme dal collector')
+    parser.add_argument('--publish-every', type=int, default=PUBLISH_EVERY,
+                        help='train_step tra due versioni dei pesi per il collector')
+    parser.add_argument('--max-lag', type=int, default=MAX_LAG,
+                        help='train_step arretrati oltre i quali il collector aspetta il learner')
+    parser.add_argument('--warmup', type=int, default=main.WARMUP,
+                        help='transizioni raccolte prima del primo train_step')
+    parser.add_argument('--train-every', type=main.positive_int, default=main.TRAIN_EVERY,
+                        help='passi del collector tra due aggiornamenti')
+    parser.add_argument('--updates-per-step', type=int, default=main.UPDATES_PER_STEP,
+                        help='train_step per aggiornamento')
+    parser.add_argument('--max-steps', type=int, default=main.MAX_STEPS,
+                        help='ferma il training dopo tante transizioni')
+    parser.add_argument('--max-seconds', type=float, default=main.MAX_SECONDS,
+                        help='ferma il training dopo tanti secondi')
+    parser.add_argument('--checkpoint-dir', default=main.CHECKPOINT_DIR)
+    parser.add_argument('--keep', type=int, default=main.KEEP_CHECKPOINTS, help='checkpoint da conservare')
+    parser.add_argument('--resume', nargs='?', const='latest',
+                        help='riprende dall\'ultimo checkpoint, o da quello indicato')
+    args = parser.parse_args()
+
+    scheduler = UpdateScheduler(args.warmup, args.train_every, args.updates_per_step, args.max_steps, args.max_seconds)
+    train_pipelined(args.n_envs, scheduler, CheckpointManager(args.checkpoint_dir, args.keep), args.resume,
+                    args.publish_every, args.max_lag)
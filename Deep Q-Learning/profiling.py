@@ -0,0 +1,133 @@
+import contextlib
+import cProfile
+import os
+import time
+from collections import defaultdict
+
+NULL_PHASE = contextlib.nullcontext()
+
+
+class _Phase:
+    # Context manager riutilizzato per ogni fase: nessuna allocazione per chiamata
+    __slots__ = ('stats', 'start')
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stats = self.stats
+        stats[0] += 1
+        stats[1] += elapsed
+        if elapsed > stats[2]:
+            stats[2] = elapsed
+
+
+class PhaseProfiler:
+    """Timer per fase e contatori per il ciclo di training, spenti di default.
+
+    Da spento `phase()` restituisce un context manager vuoto e `count()` non
+    fa nulla. Da acceso accumula chiamate, tempo totale e massimo per fase e
+    ogni `every` partite scrive le statistiche in `out`: CSV (una riga per
+    fase, in append) o testo Prometheus se il file finisce in `.prom`.
+    `window=(start, stop)` cattura cProfile o torch.profiler tra quelle partite.
+    """
+
+    def __init__(self, enabled=False, every=100, out='profile.csv', window=None, tool='cprofile'):
+        self.enabled = enabled
+        self.every = every
+        self.out = out
+        self.window = window
+        self.tool = tool
+        self.stats = defaultdict(lambda: [0, 0.0, 0.0])  # calls, total s, max s
+        self.counters = defaultdict(int)
+        self.phases = {}
+        self.capture = None
+        self.start_time = time.perf_counter()
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = _Phase(self.stats[name])
+        return phase
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] += n
+
+    def game_done(self, n_games):
+        """Da chiamare a fine partita: gestisce la finestra di cattura e la scrittura periodica."""
+        if not self.enabled:
+            return
+        self.counters['games'] = n_games
+        if self.window:
+            if n_games == self.window[0] and self.capture is None:
+                self._start_capture()
+            elif n_games == self.window[1] and self.capture is not None:
+                self._stop_capture()
+        if n_games % self.every == 0:
+            self.write(n_games)
+
+    def _start_capture(self):
+        if self.tool == 'torch':
+            import torch.profiler
+            self.capture = torch.profiler.profile(record_shapes=True)
+            self.capture.__enter__()
+        else:
+            self.capture = cProfile.Profile()
+            self.capture.enable()
+
+    def _stop_capture(self):
+        start, stop = self.window
+        if self.tool == 'torch':
+            self.capture.__exit__(None, None, None)
+            self.capture.export_chrome_trace(f'torch_trace_games_{start}_{stop}.json')
+        else:
+            self.capture.disable()
+            self.capture.dump_stats(f'cprofile_games_{start}_{stop}.prof')
+        self.capture = None
+
+    def write(self, n_games):
+        elapsed = time.perf_counter() - self.start_time
+        if self.out.endswith('.prom'):
+            self._write_prometheus(elapsed)
+        else:
+            self._write_csv(n_games, elapsed)
+
+    def _write_csv(self, n_games, elapsed):
+        new_file = not os.path.exists(self.out)
+        with open(self.out, 'a') as f:
+            if new_file:
+                f.write('games,elapsed_s,phase,calls,total_s,mean_us,max_us\n')
+            for name, (calls, total, longest) in sorted(self.stats.items()):
+                mean_us = total / calls * 1e6 if calls else 0.0
+                f.write(f'{n_games},{elapsed:.3f},{name},{calls},{total:.6f},{mean_us:.2f},{longest * 1e6:.2f}\n')
+            for name, value in sorted(self.counters.items()):
+                f.write(f'{n_games},{elapsed:.3f},count:{name},{value},,,\n')
+
+    def _write_prometheus(self, elapsed):
+        # Riscritto per intero e rinominato, cosi' chi lo legge non vede mai un file a meta'
+        lines = [
+            '# TYPE snake_phase_seconds_total counter',
+            *(f'snake_phase_seconds_total{{phase="{name}"}} {total:.6f}'
+              for name, (_, total, _) in sorted(self.stats.items())),
+            '# TYPE snake_phase_calls_total counter',
+            *(f'snake_phase_calls_total{{phase="{name}"}} {calls}'
+              for name, (calls, _, _) in sorted(self.stats.items())),
+            '# TYPE snake_phase_max_seconds gauge',
+            *(f'snake_phase_max_seconds{{phase="{name}"}} {longest:.6f}'
+              for name, (_, _, longest) in sorted(self.stats.items())),
+            '# TYPE snake_events_total counter',
+            *(f'snake_events_total{{event="{name}"}} {value}' for name, value in sorted(self.counters.items())),
+            '# TYPE snake_train_elapsed_seconds gauge',
+            f'snake_train_elapsed_seconds {elapsed:.3f}',
+        ]
+        tmp = self.out + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp, self.out)
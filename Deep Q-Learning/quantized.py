@@ -0,0 +1,118 @@
+"""Inferenza di LinearQNet in bf16 o int8 (quantizzazione dinamica) su CPU.
+
+    python quantized.py ../model2.pth
+    python quantized.py ../model2.pth ../model.pth --mode bf16 int8 --games 10000
+
+Per ogni modello controlla che le azioni greedy coincidano con fp32 su tutti
+i 2048 stati possibili e misura gli stati al secondo con batch 1, 64 e 4096.
+Esce con codice 1 se qualche stato raggiungibile cambia azione.
+
+La modalita' predefinita e' bf16. int8 va chiesta esplicitamente: quantizza
+per canale solo il primo strato e lascia l'ultimo in fp32 (con un unico
+fattore di scala per tutto il modello model2.pth cambiava azione in 2 dei
+288 stati raggiungibili), e con batch 4096 resta piu' lenta di bf16. Usa
+torch.ao.quantization.quantize_dynamic, deprecata a favore di torchao, che
+qui non e' una dipendenza. Il controllo vale per ogni modello: su model.pth
+anche bf16 cambia azione in 2 stati raggiungibili.
+"""
+import argparse
+import copy
+import sys
+import time
+import warnings
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from dqn_agent import LinearQNet, N_FEATURES, REACHABLE
+from numpy_policy import play_greedy
+
+MODES = ('fp32', 'bf16', 'int8')
+BATCH_SIZES = (1, 64, 4096)
+ALL_STATES = torch.tensor((np.arange(1 << N_FEATURES)[:, None] >> np.arange(N_FEATURES)) & 1, dtype=torch.float)
+
+
+class BF16Net(nn.Module):
+    # Pesi e calcolo in bfloat16, ingresso e uscita restano float32
+    def __init__(self, model):
+        super().__init__()
+        self.model = copy.deepcopy(model).to(torch.bfloat16)
+
+    def forward(self, x):
+        return self.model(x.to(torch.bfloat16)).float()
+
+
+def load_model(path, mode='fp32'):
+    """Carica un LinearQNet salvato e lo converte per l'inferenza nella precisione richiesta."""
+    model = LinearQNet(11, 256, 3)
+    model.load_state_dict(torch.load(path, map_location='cpu'))
+    model.eval()
+    if mode == 'int8':
+        # Pesi int8 di linear1 con una scala per neurone, attivazioni quantizzate a ogni
+        # chiamata; linear2 resta fp32, perche' da' direttamente i valori Q confrontati
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            warnings.filterwarnings('ignore', message='.*_?quantize_per_tensor.*')
+            return torch.ao.quantization.quantize_dynamic(
+                model, {'linear1': torch.ao.quantization.per_channel_dynamic_qconfig}, dtype=torch.qint8)
+    if mode == 'bf16':
+        return BF16Net(model)
+    return model
+
+
+def greedy_actions(model, states=ALL_STATES):
+    with torch.inference_mode():
+        return model(states).argmax(dim=1)
+
+
+def check_actions(fp32, model):
+    """Confronta le azioni greedy con il modello fp32.
+
+    Restituisce gli stati con azione diversa su 2048 e sui 288 raggiungibili,
+    e la massima perdita di valore Q fp32 dovuta alle azioni diverse.
+    """
+    with torch.inference_mode():
+        q_values = fp32(ALL_STATES)
+    actions = greedy_actions(model)
+    mismatch = (q_values.argmax(dim=1) != actions).numpy()
+    regret = q_values.max(dim=1).values - q_values.gather(1, actions[:, None]).squeeze(1)
+    return int(mismatch.sum()), int(mismatch[REACHABLE].sum()), float(regret.max())
+
+
+def throughput(model, batch_size, min_time=0.5):
+    states = ALL_STATES[torch.randint(0, len(ALL_STATES), (batch_size,))]
+    with torch.inference_mode():
+        model(states)
+        calls = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < min_time:
+            model(states)
+            calls += 1
+    return calls * batch_size / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('models', nargs='+', help='file .pth di LinearQNet')
+    parser.add_argument('--mode', nargs='+', choices=MODES[1:], default=['bf16'],
+                        help='precisioni da confrontare con fp32 (int8 solo se richiesta)')
+    parser.add_argument('--games', type=int, default=0, help='gioca anche N partite greedy headless per modalita\'')
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.models:
+        fp32 = load_model(path)
+        for mode in ['fp32'] + args.mode:
+            model = load_model(path, mode)
+            all_states, reachable, regret = check_actions(fp32, model)
+            failed |= reachable > 0
+            rates = '  '.join(f'batch {b}: {throughput(model, b):11,.0f}' for b in BATCH_SIZES)
+            print(f'{path} {mode:<5} mismatches {all_states:4}/2048 ({reachable:3}/288 reachable, '
+                  f'max Q loss {regret:.4f})  states/s {rates}')
+            if args.games:
+                # Stesse partite di test.evaluate, con il modello nella precisione scelta
+                scores, _ = play_greedy(lambda states: greedy_actions(model, torch.from_numpy(states)).numpy(),
+                                        args.games)
+                print(f'{"":{len(path)}} {mode:<5} games {args.games} mean score {scores.mean():.2f} max {scores.max()}')
+    sys.exit(1 if failed else 0)
@@ -1,15 +1,367 @@
-import random
-from collections import deque
+import copy
+import json
+import os
+import threading
+import warnings
+import numpy as np
+import torch
+
+COLUMN_NAMES = ('states', 'actions', 'rewards', 'next_states', 'dones')
+
+
+class ReplaySnapshot:
+    """A replay memory as it was when its snapshot() was taken; state_dict() makes the copy.
+
+    Taking the snapshot only records counters. The copy can then be made on
+    another thread while the loop keeps pushing (see ReplayMemory.snapshot).
+    """
+
+    def __init__(self, memory, counters):
+        self.memory = memory
+        self.counters = counters
+        self.overwritten = []  # (slots, old rows) kept by pushes made before the copy
+
+    def state_dict(self):
+        return self.memory._copy_snapshot(self)
+
 
 class ReplayMemory:
-    def __init__(self, capacity):
-        self.memory = deque(maxlen=capacity)
+    """Fixed-size ring buffer with one preallocated tensor per column.
+
+    Actions are stored as indices (0 straight, 1 right, 2 left); one-hot
+    moves like the ones returned by DQNAgent.select_action are converted on
+    push. sample() returns contiguous (state, action, reward, next_state,
+    done) tensors ready for DQNAgent.train_step.
+    """
+
+    # Snapshots whose copy has not been made yet, see snapshot()
+    _snapshots = ()
+    _snapshot_lock = threading.Lock()
+
+    def __init__(self, capacity, state_size=11):
+        self.capacity = capacity
+        self.states = torch.zeros((capacity, state_size), dtype=torch.float)
+        self.actions = torch.zeros(capacity, dtype=torch.long)
+        self.rewards = torch.zeros(capacity, dtype=torch.float)
+        self.next_states = torch.zeros((capacity, state_size), dtype=torch.float)
+        self.dones = torch.zeros(capacity, dtype=torch.bool)
+        self.pos = 0
+        self.size = 0
 
     def push(self, experience):
-        self.memory.append(experience)
+        state, action, reward, next_state, done = experience
+        if hasattr(action, '__len__'):
+            action = int(torch.as_tensor(action).argmax())
+
+        i = self.pos
+        if self._snapshots:
+            self._keep_overwritten(slice(i, i + 1))
+        self.states[i] = torch.as_tensor(state)
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = torch.as_tensor(next_state)
+        self.dones[i] = bool(done)
+        self.pos = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return i
+
+    def push_many(self, states, actions, rewards, next_states, dones):
+        """Pushes a batch of transitions; returns the slots written."""
+        actions = torch.as_tensor(actions)
+        if actions.dim() == 2:
+            actions = actions.argmax(dim=1)
+        n = len(actions)
+        if n > self.capacity:
+            # Solo le ultime `capacity` transizioni sopravviverebbero
+            keep = slice(n - self.capacity, n)
+            return self.push_many(states[keep], actions[keep], rewards[keep],
+                                  next_states[keep], dones[keep])
+
+        idx = (self.pos + torch.arange(n)) % self.capacity
+        if self._snapshots:
+            self._keep_overwritten(idx)
+        self.states[idx] = torch.as_tensor(states, dtype=torch.float)
+        self.actions[idx] = actions.to(self.actions.dtype)
+        self.rewards[idx] = torch.as_tensor(rewards, dtype=torch.float)
+        self.next_states[idx] = torch.as_tensor(next_states, dtype=torch.float)
+        self.dones[idx] = torch.as_tensor(dones, dtype=torch.bool)
+        self.pos = (self.pos + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+        return idx
 
     def sample(self, batch_size):
-        return random.sample(self.memory, batch_size)
+        idx = torch.randint(0, self.size, (batch_size,))
+        return self.gather(idx)
+
+    def gather(self, idx):
+        return (self.states[idx], self.actions[idx], self.rewards[idx],
+                self.next_states[idx], self.dones[idx])
+
+    def columns(self):
+        return (self.states, self.actions, self.rewards, self.next_states, self.dones)
+
+    def new_batch(self, batch_size):
+        """Preallocated buffers for sample_into, with the dtypes of the columns."""
+        return tuple(torch.empty((batch_size,) + column.shape[1:], dtype=column.dtype) for column in self.columns())
+
+    def sample_into(self, out):
+        """Like sample, but gathers into the tensors of `out` (from new_batch) without allocating."""
+        idx = torch.randint(0, self.size, (len(out[0]),))
+        for column, buffer in zip(self.columns(), out):
+            torch.index_select(column, 0, idx, out=buffer)
+        return out
+
+    def snapshot(self):
+        """Snapshot of the buffer as of now, without copying it.
+
+        ReplaySnapshot.state_dict() copies the columns later, e.g. on the
+        checkpoint thread. Until then, pushes keep the rows they are about to
+        overwrite, and the copy puts them back: it matches the buffer at the
+        time of this call, at the cost of the rows pushed in between.
+        """
+        snapshot = ReplaySnapshot(self, self._snapshot_counters())
+        with self._snapshot_lock:
+            self._snapshots += (snapshot,)
+        return snapshot
+
+    def _snapshot_counters(self):
+        return {'capacity': self.capacity, 'pos': self.pos, 'size': self.size}
+
+    def _keep_overwritten(self, idx):
+        rows = tuple(column[idx].clone() for column in self.columns())
+        with self._snapshot_lock:
+            for snapshot in self._snapshots:
+                snapshot.overwritten.append((idx, rows))
+
+    def _copy_snapshot(self, snapshot):
+        # Attributes as in checkpoint.capture, so restoring stays a vars() update
+        state = {name: column.clone() for name, column in zip(COLUMN_NAMES, self.columns())}
+        with self._snapshot_lock:
+            self._snapshots = tuple(s for s in self._snapshots if s is not snapshot)
+        # Newest first, so each row ends with its value at snapshot time
+        for idx, rows in reversed(snapshot.overwritten):
+            for name, row in zip(COLUMN_NAMES, rows):
+                state[name][idx] = row
+        state.update(snapshot.counters)
+        return state
 
     def __len__(self):
-        return len(self.memory)
+        return self.size
+
+
+class SumTree:
+    """Array-backed binary sum tree over `capacity` leaf priorities.
+
+    Node i has children 2i and 2i + 1, the root is node 1 and leaf j lives at
+    node size + j. Updates and proportional lookups walk one root-to-leaf
+    path, both vectorized over a whole batch of indices.
+    """
+
+    def __init__(self, capacity):
+        self.size = 1
+        while self.size < capacity:
+            self.size *= 2
+        self.depth = self.size.bit_length() - 1
+        self.tree = np.zeros(2 * self.size, dtype=np.float64)
+
+    def total(self):
+        return self.tree[1]
+
+    def update(self, idx, priorities):
+        nodes = np.asarray(idx, dtype=np.int64) + self.size
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, values):
+        """Returns the leaf index whose cumulative priority range holds each value."""
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            go_right = values >= self.tree[left]
+            values -= np.where(go_right, self.tree[left], 0.0)
+            nodes = left + go_right
+        return nodes - self.size
+
+    def get(self, idx):
+        return self.tree[np.asarray(idx) + self.size]
+
+
+class PrioritizedReplayMemory(ReplayMemory):
+    """Proportional prioritized replay (Schaul et al.) on top of ReplayMemory.
+
+    sample() additionally returns the importance-sampling weights and the
+    slots drawn; pass the TD errors returned by DQNAgent.train_step to
+    update_priorities() with those slots.
+    """
+
+    def __init__(self, capacity, state_size=11, alpha=0.6, beta=0.4,
+                 beta_increment=1e-5, eps=1e-3):
+        super().__init__(capacity, state_size)
+        self.tree = SumTree(capacity)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.eps = eps
+        self.max_priority = 1.0
+
+    def push(self, experience):
+        i = super().push(experience)
+        self.tree.update([i], self.max_priority)
+        return i
+
+    def push_many(self, states, actions, rewards, next_states, dones):
+        idx = super().push_many(states, actions, rewards, next_states, dones)
+        self.tree.update(idx.numpy(), self.max_priority)
+        return idx
+
+    def sample(self, batch_size):
+        # Campionamento stratificato: un valore per ciascun segmento della somma
+        total = self.tree.total()
+        segment = total / batch_size
+        values = (np.arange(batch_size) + np.random.uniform(size=batch_size)) * segment
+        idx = np.minimum(self.tree.find(values), self.size - 1)
+
+        probs = self.tree.get(idx) / total
+        weights = (self.size * probs) ** (-self.beta)
+        weights /= weights.max()
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        idx = torch.from_numpy(idx)
+        return self.gather(idx) + (torch.as_tensor(weights, dtype=torch.float), idx)
+
+    def _snapshot_counters(self):
+        # The tree also changes on update_priorities, so it is copied right away
+        counters = super()._snapshot_counters()
+        counters.update(tree=copy.deepcopy(self.tree), alpha=self.alpha, beta=self.beta,
+                        beta_increment=self.beta_increment, eps=self.eps, max_priority=self.max_priority)
+        return counters
+
+    def update_priorities(self, idx, td_errors):
+        td_errors = torch.as_tensor(td_errors).detach().abs().double().numpy()
+        priorities = (td_errors + self.eps) ** self.alpha
+        self.tree.update(torch.as_tensor(idx).numpy(), priorities)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+
+
+class MemmapReplayMemory(ReplayMemory):
+    """ReplayMemory whose columns live in numpy.memmap files inside `directory`.
+
+    The five columns are fixed-width raw files (actions as int8) viewed as
+    tensors, so push, push_many and sample work unchanged and sampling is a
+    vectorized fancy index that faults in only the pages it touches. `pos`,
+    `size` and `pushed` (transitions pushed since the buffer was created) are
+    kept in a small memmapped counter file, so opening an existing directory
+    resumes the buffer without reading it. The OS decides when dirty pages
+    reach the disk; call flush() to force it.
+    """
+
+    COLUMNS = {
+        'states': (np.float32, True),
+        'actions': (np.int8, False),
+        'rewards': (np.float32, False),
+        'next_states': (np.float32, True),
+        'dones': (np.bool_, False),
+    }
+    COUNTERS = ('pos', 'size', 'pushed')
+
+    def __init__(self, directory, capacity, state_size=11):
+        self.directory = directory
+        self.capacity = capacity
+        header_file = os.path.join(directory, 'header.json')
+        header = {'capacity': capacity, 'state_size': state_size,
+                  'columns': {name: np.dtype(dtype).str for name, (dtype, _) in self.COLUMNS.items()},
+                  'counters': list(self.COUNTERS)}
+        if os.path.exists(header_file):
+            with open(header_file) as f:
+                existing = json.load(f)
+            if existing != header:
+                raise ValueError(f'{directory}: replay buffer {existing} does not match {header}')
+            mode = 'r+'
+        else:
+            os.makedirs(directory, exist_ok=True)
+            mode = 'w+'
+
+        self.maps = {}
+        for name, (dtype, per_state) in self.COLUMNS.items():
+            shape = (capacity, state_size) if per_state else (capacity,)
+            self.maps[name] = np.memmap(os.path.join(directory, name + '.bin'), dtype=dtype, mode=mode, shape=shape)
+            setattr(self, name, torch.from_numpy(self.maps[name]))
+        self.counters = np.memmap(os.path.join(directory, 'counters.bin'), dtype=np.int64, mode=mode,
+                                  shape=(len(self.COUNTERS),))
+
+        if mode == 'w+':
+            # The header goes last: a directory without it is an unfinished buffer
+            with open(header_file, 'w') as f:
+                json.dump(header, f)
+
+    @property
+    def pos(self):
+        return int(self.counters[0])
+
+    @pos.setter
+    def pos(self, value):
+        self.counters[0] = value
+
+    @property
+    def size(self):
+        return int(self.counters[1])
+
+    @size.setter
+    def size(self, value):
+        self.counters[1] = value
+
+    @property
+    def pushed(self):
+        return int(self.counters[2])
+
+    @pushed.setter
+    def pushed(self, value):
+        self.counters[2] = value
+
+    def push(self, experience):
+        i = super().push(experience)
+        self.pushed += 1
+        return i
+
+    def push_many(self, states, actions, rewards, next_states, dones):
+        # Set, not incremented: push_many calls itself once for batches larger than the buffer
+        pushed = self.pushed
+        idx = super().push_many(states, actions, rewards, next_states, dones)
+        self.pushed = pushed + len(actions)
+        return idx
+
+    def flush(self):
+        for column in self.maps.values():
+            column.flush()
+        self.counters.flush()
+
+    def state_dict(self):
+        # Checkpoints keep only the counters, the data stays in the files. Rows
+        # overwritten after the checkpoint are not rolled back: load_state_dict
+        # uses `pushed` to tell whether that happened.
+        return {'pos': self.pos, 'size': self.size, 'pushed': self.pushed}
+
+    def snapshot(self):
+        # Only the counters: nothing to keep on push, and no msync on the training thread
+        return ReplaySnapshot(self, self.state_dict())
+
+    def _copy_snapshot(self, snapshot):
+        # Called on the checkpoint thread: the rows behind the counters reach the disk first
+        self.flush()
+        return dict(snapshot.counters)
+
+    def load_state_dict(self, state):
+        # Pushes after the checkpoint first fill the capacity - size free slots,
+        # then overwrite the oldest rows the checkpoint still samples from
+        if 'pushed' in state:
+            overwritten = self.pushed - state['pushed'] - (self.capacity - state['size'])
+            if overwritten > 0:
+                warnings.warn(f'{self.directory}: {min(overwritten, state["size"])} of the {state["size"]} rows '
+                              f'of the checkpoint were overwritten after it was taken; the resumed run will '
+                              f'not sample the same data', stacklevel=2)
+        self.pos = state['pos']
+        self.size = state['size']
+        self.pushed = state.get('pushed', self.pushed)
@@ -1,14 +1,25 @@
 import pygame
 import random
 import numpy as np
+from collections import deque
+
+# Canali della griglia restituita da get_grid
+BODY, HEAD, FOOD = 0, 1, 2
 
 class SnakeGameAI:
-    def __init__(self, w=640, h=480, visualize=True):
+    def __init__(self, w=640, h=480, visualize=True, seed=None, grid=False):
         self.w = w
         self.h = h
         self.block_size = 20
+        self.grid_w = w // self.block_size
+        self.grid_h = h // self.block_size
         self.speed = 40
         self.visualize = visualize
+        # Generatore proprio: con lo stesso seed e le stesse azioni la partita si ripete identica
+        self.rng = random.Random(seed)
+        # Con grid=True si tiene il tabellone come uint8 [corpo, testa, cibo],
+        # aggiornato a ogni mossa solo nelle celle che cambiano
+        self.grid = np.zeros((3, self.grid_h, self.grid_w), dtype=np.uint8) if grid else None
 
         if self.visualize:
             pygame.init()
@@ -18,22 +29,71 @@ class SnakeGameAI:
 
         self.reset()
 
-    def reset(self):
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng.seed(seed)
         self.direction = 0  # 0: right, 1: left, 2: up, 3: down
         self.head = [self.w / 2, self.h / 2]
-        self.snake = [self.head[:], [self.head[0] - self.block_size, self.head[1]],
-                      [self.head[0] - (2 * self.block_size), self.head[1]]]
+        self.snake = deque([self.head[:], [self.head[0] - self.block_size, self.head[1]],
+                            [self.head[0] - (2 * self.block_size), self.head[1]]])
+        # Griglia di occupazione del corpo senza la testa, cioe' di snake[1:]
+        self.occupied = np.zeros((self.grid_h, self.grid_w), dtype=bool)
+        for pt in list(self.snake)[1:]:
+            self.set_occupied(pt, True)
+        # Indice delle celle libere (fuori da tutto il serpente) con rimozione
+        # per scambio: free_cells[free_pos[c]] == c, free_pos[c] == -1 se occupata
+        n_cells = self.grid_w * self.grid_h
+        self.free_cells = list(range(n_cells))
+        self.free_pos = list(range(n_cells))
+        for pt in self.snake:
+            self.take_cell(pt)
         self.score = 0
         self.food = None
         self.place_food()
         self.frame_iteration = 0
 
+        if self.grid is not None:
+            self.grid.fill(0)
+            for pt in list(self.snake)[1:]:
+                self.draw(BODY, pt, 1)
+            self.draw(HEAD, self.head, 1)
+            self.draw(FOOD, self.food, 1)
+
+    def get_grid(self):
+        # Vista in sola lettura, senza copia: la prossima mossa la modifica
+        view = self.grid.view()
+        view.flags.writeable = False
+        return view
+
+    def draw(self, channel, pt, value):
+        x, y = int(pt[0]) // self.block_size, int(pt[1]) // self.block_size
+        if 0 <= x < self.grid_w and 0 <= y < self.grid_h:
+            self.grid[channel, y, x] = value
+
     def place_food(self):
-        x = random.randint(0, (self.w - self.block_size) // self.block_size) * self.block_size
-        y = random.randint(0, (self.h - self.block_size) // self.block_size) * self.block_size
-        self.food = [x, y]
-        if self.food in self.snake:
-            self.place_food()
+        # Un'unica estrazione uniforme tra le celle libere; False se non ce ne sono
+        if not self.free_cells:
+            return False
+        cell = self.free_cells[self.rng.randrange(len(self.free_cells))]
+        self.food = [(cell % self.grid_w) * self.block_size, (cell // self.grid_w) * self.block_size]
+        return True
+
+    def take_cell(self, pt):
+        cell = self.cell_index(pt)
+        p = self.free_pos[cell]
+        last = self.free_cells.pop()
+        if last != cell:
+            self.free_cells[p] = last
+            self.free_pos[last] = p
+        self.free_pos[cell] = -1
+
+    def release_cell(self, pt):
+        cell = self.cell_index(pt)
+        self.free_pos[cell] = len(self.free_cells)
+        self.free_cells.append(cell)
+
+    def cell_index(self, pt):
+        return (int(pt[1]) // self.block_size) * self.grid_w + int(pt[0]) // self.block_size
 
     def play_step(self, action):
         self.frame_iteration += 1
@@ -45,7 +105,12 @@ class SnakeGameAI:
                     quit()
 
         self.move(action)
-        self.snake.insert(0, self.head[:])
+        self.set_occupied(self.snake[0], True)
+        if self.grid is not None:
+            self.draw(HEAD, self.snake[0], 0)
+            self.draw(BODY, self.snake[0], 1)
+            self.draw(HEAD, self.head, 1)
+        self.snake.appendleft(self.head[:])
 
         reward = 0
         game_over = False
@@ -54,12 +119,24 @@ class SnakeGameAI:
             reward = -10
             return reward, game_over, self.score
 
+        self.take_cell(self.head)
         if self.head == self.food:
             self.score += 1
             reward = 10
-            self.place_food()
+            if self.grid is not None:
+                self.draw(FOOD, self.food, 0)
+            if not self.place_food():
+                # Tabellone pieno: partita vinta, nessuna cella per il cibo
+                game_over = True
+                return reward, game_over, self.score
+            if self.grid is not None:
+                self.draw(FOOD, self.food, 1)
         else:
-            self.snake.pop()
+            tail = self.snake.pop()
+            self.set_occupied(tail, False)
+            self.release_cell(tail)
+            if self.grid is not None:
+                self.draw(BODY, tail, 0)
 
         if self.visualize:
             self.update_ui()
@@ -72,10 +149,13 @@ class SnakeGameAI:
             pt = self.head
         if pt[0] > self.w - self.block_size or pt[0] < 0 or pt[1] > self.h - self.block_size or pt[1] < 0:
             return True
-        if pt in self.snake[1:]:
+        if self.occupied[int(pt[1]) // self.block_size, int(pt[0]) // self.block_size]:
             return True
         return False
 
+    def set_occupied(self, pt, value):
+        self.occupied[int(pt[1]) // self.block_size, int(pt[0]) // self.block_size] = value
+
     def update_ui(self):
         self.display.fill((0, 0, 0))
 
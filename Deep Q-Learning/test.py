@@ -1,22 +1,72 @@
-import pygame
-import torch
+import argparse
+import os
+import numpy as np
 from snake_game import SnakeGameAI
-from dqn_agent import DQNAgent
+from numpy_policy import NumpyPolicy, export_npz, game_state, play_greedy
+from episode_log import EpisodeWriter
 
-def test():
+# I pesi si salvano solo in .pth; test e valutazione giocano con NumpyPolicy su
+# una copia .npz accanto al .pth, rigenerata quando il .pth e' piu' recente
+WEIGHTS = 'model2.pth'
+
+def load_agent(path='model2.pth'):
+    # Percorso con torch e DQNAgent completo, usato solo per confronto
+    import torch
+    from dqn_agent import DQNAgent
     agent = DQNAgent(11, 256, 3, 0)
-    agent.model.load_state_dict(torch.load('model2.pth'))
+    agent.model.load_state_dict(torch.load(path))
     agent.model.eval()
+    agent.policy.invalidate()
+    return agent
+
+def npz_weights(path):
+    # Percorso di un .npz aggiornato; la conversione da .pth (con torch) solo se serve
+    if not path.endswith('.pth'):
+        return path
+    npz_path = path.rsplit('.', 1)[0] + '.npz'
+    if not os.path.exists(npz_path) or os.path.getmtime(npz_path) < os.path.getmtime(path):
+        export_npz(path, npz_path)
+    return npz_path
+
+def load_policy(path=WEIGHTS):
+    return NumpyPolicy(npz_weights(path))
 
-    game = SnakeGameAI()
+def test(path=WEIGHTS, log_path=None):
+    policy = load_policy(path)
+    episodes = EpisodeWriter(log_path) if log_path else None
+
+    game = SnakeGameAI(seed=episodes.begin() if episodes else None)
+    state = np.empty(11, dtype=np.float32)
 
     while True:
-        state = agent.get_state(game)
-        final_move = agent.select_action(state, epsilon=0)
+        game_state(game, out=state)
+        final_move = [0, 0, 0]
+        action = policy.act(state)
+        final_move[action] = 1
         reward, done, score = game.play_step(final_move)
+        if episodes:
+            episodes.record(action)
 
         if done:
-            game.reset()
+            if episodes:
+                episodes.end()
+            game.reset(episodes.begin() if episodes else None)
+
+def evaluate(n_games, n_envs=1000, path=WEIGHTS):
+    # Valutazione greedy headless: fino a n_envs partite avanzano insieme, una per tavolo
+    policy = load_policy(path)
+    scores, _ = play_greedy(policy.act_batch, n_games, n_envs)
+    print(f"Games: {n_games} Mean score: {scores.mean():.2f} Max score: {scores.max()}")
+    return scores
 
 if __name__ == '__main__':
-    test()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--games', type=int, default=0,
+                        help='valuta N partite headless in batch invece di giocare a schermo')
+    parser.add_argument('--weights', default=WEIGHTS, help='pesi .pth (convertiti in .npz se cambiati) oppure .npz')
+    parser.add_argument('--episode-log', help='archivia seed e azioni delle partite giocate a schermo')
+    args = parser.parse_args()
+    if args.games:
+        evaluate(args.games, path=args.weights)
+    else:
+        test(args.weights, args.episode_log)
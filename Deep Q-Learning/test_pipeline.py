@@ -0,0 +1,23 @@
+"""Il training a pipeline deve finire anche con poche partite e warmup nullo,
+quando la replay resta a lungo sotto BATCH_SIZE transizioni.
+"""
+import threading
+
+from checkpoint import CheckpointManager
+from main import UpdateScheduler
+from pipeline import train_pipelined
+
+
+def test_small_replay_does_not_deadlock(tmp_path, monkeypatch):
+    # I record salvano model2.pth nella cartella corrente
+    monkeypatch.chdir(tmp_path)
+    scheduler = UpdateScheduler(warmup=0, max_steps=2000)
+    checkpoints = CheckpointManager(str(tmp_path / 'checkpoints'))
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(agent=train_pipelined(4, scheduler, checkpoints)),
+                              daemon=True)
+    thread.start()
+    thread.join(120)
+    assert not thread.is_alive(), 'pipeline bloccata'
+    assert scheduler.env_steps >= 2000
+    assert result['agent'].updates > 0
@@ -0,0 +1,101 @@
+"""Confronto differenziale: SnakeGameAI (deque + griglia di occupazione) contro
+il motore originale a liste, su partite casuali con seed.
+
+Il cibo del motore originale viene preso da SnakeGameAI, perche' i due
+generatori di posizioni sono diversi; tutto il resto deve coincidere a ogni passo.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from snake_game import SnakeGameAI
+
+
+class ListSnakeGame:
+    # play_step, move e is_collision del SnakeGameAI originale, con il corpo in una lista
+    def __init__(self, w, h, food):
+        self.w = w
+        self.h = h
+        self.block_size = 20
+        self.direction = 0
+        self.head = [self.w / 2, self.h / 2]
+        self.snake = [self.head[:], [self.head[0] - self.block_size, self.head[1]],
+                      [self.head[0] - (2 * self.block_size), self.head[1]]]
+        self.score = 0
+        self.food = list(food)
+        self.frame_iteration = 0
+
+    def play_step(self, action, next_food):
+        self.frame_iteration += 1
+        self.move(action)
+        self.snake.insert(0, self.head[:])
+
+        reward = 0
+        game_over = False
+        if self.is_collision() or self.frame_iteration > 100 * len(self.snake):
+            game_over = True
+            reward = -10
+            return reward, game_over, self.score
+
+        if self.head == self.food:
+            self.score += 1
+            reward = 10
+            self.food = list(next_food)
+        else:
+            self.snake.pop()
+        return reward, game_over, self.score
+
+    def is_collision(self, pt=None):
+        if pt is None:
+            pt = self.head
+        if pt[0] > self.w - self.block_size or pt[0] < 0 or pt[1] > self.h - self.block_size or pt[1] < 0:
+            return True
+        if pt in self.snake[1:]:
+            return True
+        return False
+
+    def move(self, action):
+        clock_wise = [0, 2, 1, 3]  # right, up, left, down
+        idx = clock_wise.index(self.direction)
+        if np.array_equal(action, [1, 0, 0]):
+            new_dir = clock_wise[idx]
+        elif np.array_equal(action, [0, 1, 0]):
+            new_dir = clock_wise[(idx + 1) % 4]
+        else:
+            new_dir = clock_wise[(idx - 1) % 4]
+        self.direction = new_dir
+
+        x, y = self.head
+        if self.direction == 0:
+            x += self.block_size
+        elif self.direction == 1:
+            x -= self.block_size
+        elif self.direction == 2:
+            y -= self.block_size
+        elif self.direction == 3:
+            y += self.block_size
+        self.head = [x, y]
+
+
+@pytest.mark.parametrize('w, h', [(160, 120), (640, 480)])
+@pytest.mark.parametrize('seed', range(3))
+def test_matches_list_engine(w, h, seed):
+    rng = random.Random(seed)
+    game = SnakeGameAI(w, h, visualize=False, seed=seed)
+    reference = ListSnakeGame(w, h, game.food)
+
+    for step in range(20_000):
+        move = [0, 0, 0]
+        # Soprattutto dritto, per avere serpenti lunghi e scontri con il corpo
+        move[rng.choices([0, 1, 2], weights=[6, 1, 1])[0]] = 1
+        result = game.play_step(move)
+        assert reference.play_step(move, game.food) == result, step
+        assert reference.head == game.head, step
+        assert reference.snake == list(game.snake), step
+        assert reference.food == game.food, step
+        assert reference.direction == game.direction, step
+
+        if result[1]:
+            game.reset()
+            reference = ListSnakeGame(w, h, game.food)
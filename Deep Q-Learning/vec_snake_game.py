@@ -0,0 +1,193 @@
+import numpy as np
+
+# Stesse convenzioni di SnakeGameAI: 0: right, 1: left, 2: up, 3: down
+DIR_DX = np.array([1, -1, 0, 0])
+DIR_DY = np.array([0, 0, -1, 1])
+CLOCK_WISE = np.array([0, 2, 1, 3])  # right, up, left, down
+CLOCK_WISE_INDEX = np.argsort(CLOCK_WISE)  # direction -> position in CLOCK_WISE
+TURN = np.array([0, 1, -1])  # [1, 0, 0] straight, [0, 1, 0] right, [0, 0, 1] left
+BODY, HEAD, FOOD = 0, 1, 2  # Canali della griglia, come in SnakeGameAI
+
+
+class VecSnakeGame:
+    """Headless batch of SnakeGameAI boards stepped together in NumPy.
+
+    Positions are stored in cells (pixels // block_size). Each snake body is a
+    ring buffer of flat cell indices (y * grid_w + x) backed by a boolean
+    occupancy grid and a swap-remove index of free cells, so a step and a
+    food draw cost the same whatever the snake length. Finished boards,
+    including boards the snake has filled completely, are reset
+    automatically inside play_step.
+
+    With grid=True the boards are also kept as an (n_envs, 3, grid_h, grid_w)
+    uint8 array of [body, head, food] channels, rewritten only where a move
+    changes them; grids() returns it without copying.
+    """
+
+    def __init__(self, n_envs, w=640, h=480, block_size=20, seed=None, grid=False):
+        self.n_envs = n_envs
+        self.w = w
+        self.h = h
+        self.block_size = block_size
+        self.grid_w = w // block_size
+        self.grid_h = h // block_size
+        self.n_cells = self.grid_w * self.grid_h
+        self.rng = np.random.default_rng(seed)
+
+        n = n_envs
+        self.env_ids = np.arange(n)
+        self.head = np.zeros((n, 2), dtype=np.int64)  # (x, y) in cells
+        self.direction = np.zeros(n, dtype=np.int64)
+        self.food = np.zeros((n, 2), dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.frame_iteration = np.zeros(n, dtype=np.int64)
+
+        # Corpo: buffer circolare, la testa e' in body[i, body_head[i]]
+        # e la coda in body[i, body_head[i] - length[i] + 1]
+        self.body = np.zeros((n, self.n_cells + 1), dtype=np.int64)
+        self.body_head = np.zeros(n, dtype=np.int64)
+        self.length = np.zeros(n, dtype=np.int64)
+        self.occupied = np.zeros((n, self.n_cells), dtype=bool)
+
+        # Celle libere: free[i, :n_free[i]] elenca le celle fuori dal serpente
+        # e free_pos[i, c] e' la posizione di c in quell'elenco (-1 se occupata)
+        self.free = np.zeros((n, self.n_cells), dtype=np.int64)
+        self.free_pos = np.zeros((n, self.n_cells), dtype=np.int64)
+        self.n_free = np.zeros(n, dtype=np.int64)
+
+        # Griglia per agenti convoluzionali; cells e' la stessa memoria indicizzata per cella
+        self.grid = np.zeros((n, 3, self.grid_h, self.grid_w), dtype=np.uint8) if grid else None
+        if grid:
+            self.cells = self.grid.reshape(n, 3, self.n_cells)
+
+        self.reset()
+
+    def reset(self, env_ids=None):
+        if env_ids is None:
+            env_ids = self.env_ids
+        x = (self.w // 2) // self.block_size
+        y = (self.h // 2) // self.block_size
+        cells = y * self.grid_w + np.array([x - 2, x - 1, x])  # tail -> head
+
+        self.direction[env_ids] = 0
+        self.head[env_ids] = (x, y)
+        self.occupied[env_ids] = False
+        self.occupied[env_ids[:, None], cells] = True
+        self.body[env_ids, :3] = cells
+        self.free[env_ids] = np.arange(self.n_cells)
+        self.free_pos[env_ids] = np.arange(self.n_cells)
+        self.n_free[env_ids] = self.n_cells
+        for cell in cells:
+            self._take_cell(env_ids, np.full(len(env_ids), cell))
+        self.body_head[env_ids] = 2
+        self.length[env_ids] = 3
+        self.score[env_ids] = 0
+        self.frame_iteration[env_ids] = 0
+        if self.grid is not None:
+            self.grid[env_ids] = 0
+            self.cells[env_ids[:, None], BODY, cells[:-1]] = 1
+            self.cells[env_ids, HEAD, cells[-1]] = 1
+        self.place_food(env_ids)
+
+    def grids(self):
+        # Vista in sola lettura, senza copia: il prossimo play_step la modifica
+        view = self.grid.view()
+        view.flags.writeable = False
+        return view
+
+    def place_food(self, env_ids):
+        # Un'unica estrazione tra le celle libere, qualunque sia il riempimento
+        env_ids = np.asarray(env_ids)
+        k = self.rng.integers(0, self.n_free[env_ids])
+        if self.grid is not None:
+            self.cells[env_ids, FOOD, self.food[env_ids, 1] * self.grid_w + self.food[env_ids, 0]] = 0
+        self._set_food(env_ids, self.free[env_ids, k])
+        if self.grid is not None:
+            self.cells[env_ids, FOOD, self.free[env_ids, k]] = 1
+
+    def _take_cell(self, env_ids, cells):
+        # Swap-remove: l'ultima cella libera prende il posto di quella occupata
+        p = self.free_pos[env_ids, cells]
+        last = self.free[env_ids, self.n_free[env_ids] - 1]
+        self.free[env_ids, p] = last
+        self.free_pos[env_ids, last] = p
+        self.free_pos[env_ids, cells] = -1
+        self.n_free[env_ids] -= 1
+
+    def _release_cell(self, env_ids, cells):
+        k = self.n_free[env_ids]
+        self.free[env_ids, k] = cells
+        self.free_pos[env_ids, cells] = k
+        self.n_free[env_ids] += 1
+
+    def _set_food(self, env_ids, cells):
+        self.food[env_ids, 0] = cells % self.grid_w
+        self.food[env_ids, 1] = cells // self.grid_w
+
+    def play_step(self, action):
+        """Steps every board with one action each.
+
+        `action` is either an (n_envs, 3) one-hot array like SnakeGameAI
+        expects or an (n_envs,) array of indices (0 straight, 1 right,
+        2 left). Returns (reward, done, score) arrays; `score` holds the
+        final score of boards that were just reset. A board whose snake
+        fills every cell ends with done=True and the +10 of the last food.
+        """
+        action = np.asarray(action)
+        if action.ndim == 2:
+            action = action.argmax(axis=1)
+
+        self.frame_iteration += 1
+
+        idx = CLOCK_WISE_INDEX[self.direction]
+        self.direction = CLOCK_WISE[(idx + TURN[action]) % 4]
+        self.head[:, 0] += DIR_DX[self.direction]
+        self.head[:, 1] += DIR_DY[self.direction]
+        x = self.head[:, 0]
+        y = self.head[:, 1]
+
+        # Il controllo avviene con la testa gia' inserita: il vecchio corpo,
+        # coda compresa, conta come ostacolo e len(snake) vale length + 1
+        out = (x < 0) | (x >= self.grid_w) | (y < 0) | (y >= self.grid_h)
+        cell = np.where(out, 0, y * self.grid_w + x)
+        done = out | self.occupied[self.env_ids, cell]
+        done |= self.frame_iteration > 100 * (self.length + 1)
+        reward = np.where(done, -10, 0)
+
+        alive = np.flatnonzero(~done)
+        new_cell = cell[alive]
+        if self.grid is not None:
+            old_head = self.body[alive, self.body_head[alive]]
+            self.cells[alive, HEAD, old_head] = 0
+            self.cells[alive, BODY, old_head] = 1
+            self.cells[alive, HEAD, new_cell] = 1
+        self.body_head[alive] = (self.body_head[alive] + 1) % self.body.shape[1]
+        self.body[alive, self.body_head[alive]] = new_cell
+        self.occupied[alive, new_cell] = True
+        self._take_cell(alive, new_cell)
+        self.length[alive] += 1
+
+        food_cell = self.food[alive, 1] * self.grid_w + self.food[alive, 0]
+        eaten = new_cell == food_cell
+        ate = alive[eaten]
+        self.score[ate] += 1
+        reward[ate] = 10
+
+        starved = alive[~eaten]
+        tail = (self.body_head[starved] - self.length[starved] + 1) % self.body.shape[1]
+        tail_cell = self.body[starved, tail]
+        self.occupied[starved, tail_cell] = False
+        self._release_cell(starved, tail_cell)
+        if self.grid is not None:
+            self.cells[starved, BODY, tail_cell] = 0
+        self.length[starved] -= 1
+
+        # Tabellone pieno: nessuna cella per il cibo, la partita finisce vinta
+        full = self.n_free[ate] == 0
+        done[ate[full]] = True
+        self.place_food(ate[~full])
+
+        score = self.score.copy()
+        if done.any():
+            self.reset(np.flatnonzero(done))
+        return reward, done, score
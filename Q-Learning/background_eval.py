@@ -0,0 +1,145 @@
+"""Periodic greedy evaluation in a separate process, without pausing training.
+
+Every `every` episodes the training loop hands a copy of the Q-table (or of
+the DQN weights) to BackgroundEvaluator, which scores it in another process
+on the same seeded set of games. Score and game length (mean, median, max)
+are printed and appended to a CSV, so progress can be followed over time. If
+the process is still busy when a new copy arrives, the waiting copy is
+replaced by the newer one.
+
+The process is started with 'spawn', not forked from a training process that
+already runs threads. The game function is picklable and takes
+(snapshot, n_games, seed), returning the scores and lengths of the games.
+This module only needs NumPy, so both the tabular and the DQN trainers use it.
+"""
+import csv
+import multiprocessing as mp
+import os
+import queue
+import time
+import traceback
+
+import numpy as np
+
+FIELDS = ["games", "seconds", "score_mean", "score_median", "score_max",
+          "length_mean", "length_median", "length_max", "skipped"]
+CLOSE_TIMEOUT = 600  # Seconds close() waits for the last evaluation before stopping the process
+
+
+def _worker(play, jobs, results, n_games, seed):
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        games, seconds, snapshot = job
+        try:
+            scores, lengths = play(snapshot, n_games=n_games, seed=seed)
+        except Exception:
+            # Reported by poll() in the training process; nothing more to evaluate
+            results.put(("error", games, traceback.format_exc()))
+            return
+        results.put(("result", games, seconds, np.asarray(scores), np.asarray(lengths)))
+
+
+class BackgroundEvaluator:
+    """Evaluates copies of the model every `every` episodes in a separate process.
+
+    `submit(games, snapshot)` never blocks; `poll()` collects finished results,
+    prints them and writes them to `out`; `close()` waits for the last
+    evaluation (up to `timeout` seconds) and stops the process. An evaluation
+    that fails, or a process that dies, raises RuntimeError from the next
+    submit, poll or close.
+    """
+
+    def __init__(self, play, every, n_games, seed=0, out=None):
+        self.every = every
+        self.out = out
+        self.skipped = 0
+        self.next_games = every
+        self.start = time.perf_counter()
+        self.closing = False
+        context = mp.get_context("spawn")
+        self.jobs = context.Queue(maxsize=1)
+        self.results = context.Queue()
+        self.process = context.Process(target=_worker, args=(play, self.jobs, self.results, n_games, seed),
+                                       daemon=True)
+        self.process.start()
+        self.history = []
+
+    def due(self, games):
+        # True once for every multiple of `every` reached
+        if not self.every or games < self.next_games:
+            return False
+        self.next_games = (games // self.every + 1) * self.every
+        return True
+
+    def submit(self, games, snapshot):
+        self.poll()
+        job = (games, round(time.perf_counter() - self.start, 1), snapshot)
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            # The process has not taken the previous copy yet: replace it
+            try:
+                self.jobs.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.jobs.put_nowait(job)
+            except queue.Full:
+                pass  # The waiting copy was not readable yet: it stays
+            self.skipped += 1
+
+    def poll(self):
+        while True:
+            try:
+                kind, games, *result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "error":
+                self._stop()
+                raise RuntimeError(f"evaluation at {games} games failed in the background process:\n{result[0]}")
+            self._record(games, *result)
+        if not self.closing and not self.process.is_alive():
+            raise RuntimeError(f"evaluation process exited with code {self.process.exitcode}")
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        self.closing = True
+        deadline = time.monotonic() + timeout
+        if self.process.is_alive():
+            try:
+                self.jobs.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self.process.join(max(0, deadline - time.monotonic()))
+        self._stop()
+        self.poll()
+        if self.process.exitcode != 0:
+            raise RuntimeError(f"evaluation process exited with code {self.process.exitcode}")
+
+    def _stop(self):
+        self.closing = True
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+    def report(self, row):
+        print(f"Evaluation at {row['games']} episodes: score mean {row['score_mean']:.2f} "
+              f"median {row['score_median']:.0f} max {row['score_max']}  "
+              f"length mean {row['length_mean']:.0f} median {row['length_median']:.0f} max {row['length_max']}")
+
+    def _record(self, games, seconds, scores, lengths):
+        # seconds: when the copy was taken, not when the evaluation finished
+        row = {"games": games, "seconds": seconds,
+               "score_mean": scores.mean(), "score_median": np.median(scores), "score_max": scores.max(),
+               "length_mean": lengths.mean(), "length_median": np.median(lengths), "length_max": lengths.max(),
+               "skipped": self.skipped}
+        self.history.append(row)
+        self.report(row)
+        if self.out:
+            new_file = not os.path.exists(self.out)
+            with open(self.out, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=FIELDS)
+                if new_file:
+                    writer.writeheader()
+                writer.writerow(row)
@@ -1,29 +1,10 @@
 import numpy as np
 import time
 from snake_env import SnakeEnv
+from q_table import encode_states, load_q_table
 
-# Load Q-Table
-q_table = np.load("final.npy", allow_pickle=True).item()
-
-# Discretize state (same as training)
-def discretize_state(state):
-    """Transforms the continuous state into a discrete one for the Q-table."""
-    direction = int(state[0])  # Snake's direction
-    dx = int((state[1] + 1) * 5)  # Transform from [-1, 1] to [0, 10]
-    dy = int((state[2] + 1) * 5)  # Same for dy
-
-    collision_risks = tuple(map(int, state[3:7]))  # Binary collision risks
-
-    # Return the discretized state as a tuple
-    return (direction, dx, dy) + collision_risks
-
-# Function to select an action based on the Q-Table
-def choose_action(state):
-    state_key = tuple(state)  # Ensure it is a tuple
-    if state_key in q_table:
-        return np.argmax(q_table[state_key])  # Action with the highest value in the Q-Table
-    else:
-        return env.action_space.sample()  # If not found, explore randomly
+# Load Q-Table (pickled dict or dense array, always used as a dense array)
+q_table = load_q_table("final.npy")
 
 # Initialize the environment
 env = SnakeEnv()
@@ -33,14 +14,14 @@ num_episodes = 10
 total_rewards = []
 
 for episode in range(num_episodes):
-    state = discretize_state(env.reset())
+    state = encode_states(env.reset())
     score = 0
 
     while True:
         # Best action based on the Q-table
-        action = np.argmax([q_table.get(state + (a,), 0) for a in range(env.action_space.n)])
+        action = q_table[state].argmax()
         next_state, reward, done, _ = env.step(action)
-        next_state = discretize_state(next_state)
+        next_state = encode_states(next_state)
         state = next_state
 
         if reward > 0:
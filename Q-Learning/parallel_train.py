@@ -0,0 +1,166 @@
+import argparse
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import train_agent
+from q_table import N_STATES, N_ACTIONS, new_q_table, load_checkpoint, save_checkpoint
+from snake_env import SnakeEnv
+
+CHUNK = 50  # Episodes claimed from the shared counter at a time
+
+
+def attach(shm):
+    """Views a shared memory block as the dense Q-table."""
+    return np.ndarray((N_STATES, N_ACTIONS), dtype=np.float32, buffer=shm.buf)
+
+
+def claim_episodes(next_episode, num_episodes):
+    """Reserves the next chunk of global episode numbers, returning a (possibly empty) range."""
+    with next_episode.get_lock():
+        start = next_episode.value
+        stop = min(start + CHUNK, num_episodes)
+        next_episode.value = max(start, stop)
+    return range(start, stop)
+
+
+def worker(worker_id, shm_name, next_episode, completed, total_steps, merge_lock, num_episodes, merge_every, seed):
+    """Runs episodes claimed from the shared counter until the budget is spent.
+
+    With merge_every == 0 updates go straight into the shared table (Hogwild,
+    no locks). Otherwise the worker learns on a private copy and every
+    merge_every episodes adds its accumulated delta to the shared table under
+    a lock, then refreshes its copy.
+    """
+    # Each process needs its own random streams, a fork copies the parent's
+    np.random.seed(seed + worker_id)
+    env = SnakeEnv(seed=seed + worker_id)
+    env.action_space.seed(seed + worker_id)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    shared = attach(shm)
+    if merge_every:
+        q_table = shared.copy()
+        base = q_table.copy()
+    else:
+        q_table = shared
+
+    since_merge = 0
+    steps = 0
+    while True:
+        episodes = claim_episodes(next_episode, num_episodes)
+        if not episodes:
+            break
+        for episode in episodes:
+            # The epsilon schedule follows the global episode number, as in the serial loop
+            epsilon = train_agent.epsilon_at(episode)
+            total_reward, episode_steps = train_agent.run_dense_episode(env, q_table, epsilon)
+            steps += episode_steps
+            if episode % 1000 == 0:
+                print(f"[worker {worker_id}] Episode {episode}: Total reward: {total_reward} Epsilon: {epsilon}")
+
+            since_merge += 1
+            if merge_every and since_merge >= merge_every:
+                merge(shared, q_table, base, merge_lock)
+                since_merge = 0
+
+        with completed.get_lock():
+            completed.value += len(episodes)
+
+    if merge_every and since_merge:
+        merge(shared, q_table, base, merge_lock)
+    with total_steps.get_lock():
+        total_steps.value += steps
+    env.close()
+    del shared, q_table
+    shm.close()
+
+
+def merge(shared, q_table, base, lock):
+    """Adds the local changes since the last merge to the shared table and pulls the merged values back."""
+    with lock:
+        shared += q_table - base
+        q_table[:] = shared
+    base[:] = q_table
+
+
+def train_parallel(num_workers, num_episodes, merge_every=0, q_table=None, checkpoint_path=None, seed=0,
+                   start_episode=0):
+    """Trains one shared Q-table with num_workers processes; returns (q_table, episodes/sec, steps/sec)."""
+    shm = shared_memory.SharedMemory(create=True, size=N_STATES * N_ACTIONS * 4)
+    try:
+        shared = attach(shm)
+        shared[:] = new_q_table() if q_table is None else q_table
+
+        next_episode = mp.Value('q', start_episode)
+        completed = mp.Value('q', start_episode)
+        total_steps = mp.Value('q', 0)
+        merge_lock = mp.Lock()
+        workers = [
+            mp.Process(target=worker, args=(i, shm.name, next_episode, completed, total_steps, merge_lock,
+                                            num_episodes, merge_every, seed))
+            for i in range(num_workers)
+        ]
+
+        start = time.perf_counter()
+        for p in workers:
+            p.start()
+
+        # Periodic checkpoints of the shared table while the workers run
+        next_save = train_agent.save_every
+        while any(p.is_alive() for p in workers):
+            time.sleep(0.5)
+            if checkpoint_path and completed.value >= next_save:
+                save_checkpoint(checkpoint_path, shared.copy(), completed.value, train_agent.hyperparameters(),
+                                epsilon=train_agent.epsilon_at(completed.value), workers=num_workers)
+                next_save = completed.value + train_agent.save_every
+        for p in workers:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        result = shared.copy()
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+
+    if checkpoint_path:
+        save_checkpoint(checkpoint_path, result, num_episodes, train_agent.hyperparameters(),
+                        epsilon=train_agent.epsilon_at(num_episodes), workers=num_workers)
+    return result, (num_episodes - start_episode) / elapsed, total_steps.value / elapsed
+
+
+def scaling_report(num_episodes, merge_every, worker_counts=(1, 2, 4, 8, 16)):
+    """Prints episodes/sec for each worker count on the same episode budget."""
+    print(f"{mp.cpu_count()} CPUs, {num_episodes} episodes per run, merge_every={merge_every}")
+    baseline = None
+    for n in worker_counts:
+        _, episodes_per_sec, steps_per_sec = train_parallel(n, num_episodes, merge_every)
+        baseline = baseline or episodes_per_sec
+        print(f"workers {n:>2}: {episodes_per_sec:9.1f} episodes/s {steps_per_sec:11.1f} steps/s "
+              f"speedup {episodes_per_sec / baseline:5.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-process tabular Q-learning on a shared-memory Q-table")
+    parser.add_argument("--workers", type=int, default=mp.cpu_count())
+    parser.add_argument("--episodes", type=int, default=train_agent.num_episodes)
+    parser.add_argument("--merge-every", type=int, default=0,
+                        help="episodes between batched merges; 0 updates the shared table lock-free (Hogwild)")
+    parser.add_argument("--resume", action="store_true", help=f"continue from the {train_agent.q_table_path} checkpoint")
+    parser.add_argument("--scaling", action="store_true", help="report episodes/sec with 1, 2, 4, 8 and 16 workers")
+    args = parser.parse_args()
+
+    if args.scaling:
+        scaling_report(args.episodes, args.merge_every)
+    else:
+        initial, start_episode = None, 0
+        if args.resume:
+            initial, header = load_checkpoint(train_agent.q_table_path)
+            start_episode = header["episodes"] or 0
+        _, episodes_per_sec, _ = train_parallel(args.workers, args.episodes, args.merge_every, initial,
+                                                train_agent.q_table_path, start_episode=start_episode)
+        print(f"Training completed at {episodes_per_sec:.1f} episodes/s! "
+              f"Q-Table saved in '{train_agent.q_table_path}'.")
@@ -0,0 +1,162 @@
+import glob
+import json
+import os
+import numpy as np
+
+# Sizes of the discretized state produced by discretize_state
+N_DIRECTIONS = 4   # UP, DOWN, LEFT, RIGHT
+N_DX = 11          # (dx + 1) * 5 truncated to [0, 10]
+N_DY = 11          # same for dy
+N_RISKS = 16       # 4 binary collision risks
+N_STATES = N_DIRECTIONS * N_DX * N_DY * N_RISKS
+N_ACTIONS = 4
+
+# Bump whenever encode_states changes meaning, so old checkpoints are rejected
+STATE_ENCODING_VERSION = 1
+
+
+def discretize_state(state):
+    """Transforms the continuous state into a discrete one for the Q-table."""
+    direction = int(state[0])  # Snake's direction
+    dx = int((state[1] + 1) * 5)  # Transform from [-1, 1] to [0, 10]
+    dy = int((state[2] + 1) * 5)  # Same for dy
+
+    collision_risks = tuple(map(int, state[3:7]))  # Binary collision risks
+
+    # Return the discretized state as a tuple
+    return (direction, dx, dy) + collision_risks
+
+
+def encode_states(states):
+    """Maps one observation (shape (7,)) or a batch (shape (n, 7)) to dense row indices.
+
+    Gives the same cells as discretize_state: the float32 arithmetic is kept
+    and astype truncates towards zero like int().
+    """
+    states = np.asarray(states, dtype=np.float32)
+    direction = states[..., 0].astype(np.int64)
+    dx = np.clip(((states[..., 1] + 1) * 5).astype(np.int64), 0, N_DX - 1)
+    dy = np.clip(((states[..., 2] + 1) * 5).astype(np.int64), 0, N_DY - 1)
+    risks = states[..., 3:7].astype(np.int64) @ np.array([8, 4, 2, 1])
+    return ((direction * N_DX + dx) * N_DY + dy) * N_RISKS + risks
+
+
+def encode_key(key):
+    """Maps a discretize_state tuple to its dense row index."""
+    direction, dx, dy, up, down, left, right = key
+    return ((direction * N_DX + dx) * N_DY + dy) * N_RISKS + (up * 8 + down * 4 + left * 2 + right)
+
+
+def new_q_table():
+    """Returns an all-zero dense Q-table, one row per state and one column per action."""
+    return np.zeros((N_STATES, N_ACTIONS), dtype=np.float32)
+
+
+def dict_to_dense(q_dict):
+    """Converts a Q-table dict keyed by `state + (action,)` into a dense array."""
+    q_table = new_q_table()
+    for key, value in q_dict.items():
+        q_table[encode_key(key[:7]), key[7]] = value
+    return q_table
+
+
+def dense_to_dict(q_table):
+    """Converts a dense Q-table back into the dict format, skipping never-updated entries."""
+    q_dict = {}
+    for index, action in zip(*np.nonzero(q_table)):
+        state, risks = divmod(int(index), N_RISKS)
+        state, dy = divmod(state, N_DY)
+        direction, dx = divmod(state, N_DX)
+        key = (direction, dx, dy, risks >> 3 & 1, risks >> 2 & 1, risks >> 1 & 1, risks & 1)
+        q_dict[key + (int(action),)] = float(q_table[index, action])
+    return q_dict
+
+
+def header_path(path):
+    """Returns the JSON header path that goes with a checkpoint array path."""
+    return os.path.splitext(path)[0] + ".json"
+
+
+def array_path(path, episodes):
+    """Returns the file the table of a checkpoint saved at `episodes` goes to, e.g. last2.5000.npy."""
+    if episodes is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{episodes}{ext}"
+
+
+def save_checkpoint(path, q_table, episodes, hyperparameters=None, **extra):
+    """Saves a dense Q-table as a raw .npy array plus a small JSON header.
+
+    The array goes to its own file (array_path) and the header, which names
+    that file, is renamed into place last: that rename commits the save. A
+    crash at any point leaves the previous header next to the array it names.
+    Arrays no longer named by the header are removed afterwards.
+    """
+    data_path = array_path(path, episodes)
+    header = {
+        "state_encoding": STATE_ENCODING_VERSION,
+        "array": os.path.basename(data_path),
+        "shape": list(q_table.shape),
+        "dtype": str(q_table.dtype),
+        "episodes": episodes,
+        "hyperparameters": hyperparameters or {},
+    }
+    header.update(extra)
+
+    tmp_path = data_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, q_table, allow_pickle=False)
+    os.replace(tmp_path, data_path)
+
+    tmp_header = header_path(path) + ".tmp"
+    with open(tmp_header, "w") as f:
+        json.dump(header, f, indent=2)
+    os.replace(tmp_header, header_path(path))
+
+    root, ext = os.path.splitext(path)
+    for old in glob.glob(glob.escape(root) + ".*" + ext):
+        if old != data_path:
+            os.remove(old)
+
+
+def load_checkpoint(path):
+    """Opens a checkpoint read-only through mmap, returning (q_table, header).
+
+    Nothing is unpickled or copied: pages are read lazily and shared through
+    the page cache by every process that opens the same file.
+    """
+    with open(header_path(path)) as f:
+        header = json.load(f)
+    if header["state_encoding"] != STATE_ENCODING_VERSION:
+        raise ValueError(f"{path}: state encoding v{header['state_encoding']}, expected v{STATE_ENCODING_VERSION}")
+
+    # Headers written before "array" existed sit next to the table at `path`
+    data_path = os.path.join(os.path.dirname(path), header.get("array", os.path.basename(path)))
+    q_table = np.load(data_path, mmap_mode="r", allow_pickle=False)
+    if list(q_table.shape) != header["shape"]:
+        raise ValueError(f"{data_path}: shape {q_table.shape} does not match header {header['shape']}")
+    return q_table, header
+
+
+def load_q_table(path):
+    """Loads a checkpoint, a pickled dict or a dense array, always returning the dense array.
+
+    Checkpoints (an array with a JSON header next to it) are memory-mapped read-only.
+    """
+    if os.path.exists(header_path(path)):
+        return load_checkpoint(path)[0]
+    data = np.load(path, allow_pickle=True)
+    if data.dtype == object:
+        return dict_to_dense(data.item())
+    return data.astype(np.float32, copy=False)
+
+
+if __name__ == "__main__":
+    # Convert pickled-dict Q-tables (e.g. trained_models/*.npy) into dense checkpoints
+    import sys
+
+    for path in sys.argv[1:]:
+        dense_path = os.path.splitext(path)[0] + "_dense.npy"
+        save_checkpoint(dense_path, load_q_table(path), episodes=None, converted_from=os.path.basename(path))
+        print(f"{path} -> {dense_path}")
@@ -4,29 +4,56 @@ from gym import spaces
 import random
 import pygame
 import sys
+from collections import deque
+
+def feature_bounds(width, height, cell_size):
+    """Bounds of [direction, dx, dy, danger up, danger down, danger left, danger right].
+
+    dx and dy are divided by the board size, but the last observation of an
+    episode may have the head one cell past an edge (or past a partial bottom
+    row), e.g. dy = -760 / 750 on the default board.
+    """
+    max_dx = (width // cell_size) * cell_size / width
+    max_dy = -(-height // cell_size) * cell_size / height
+    low = np.array([0, -max_dx, -max_dy, 0, 0, 0, 0], dtype=np.float32)
+    high = np.array([3, max_dx, max_dy, 1, 1, 1, 1], dtype=np.float32)
+    return low, high
+
+# Channels of the grid observation
+BODY, HEAD, FOOD = 0, 1, 2
 
 class SnakeEnv(gym.Env):
     """Custom Environment for Snake RL, compatible with Gym."""
     metadata = {'render.modes': ['human']}
 
-    def __init__(self):
+    def __init__(self, seed=None, observation='features'):
         super(SnakeEnv, self).__init__()
         # Dimensions of the game field
         self.width = 1400
         self.height = 750
         self.cell_size = 20
+        rows, columns = -(-self.height // self.cell_size), self.width // self.cell_size
 
         # Possible actions: [0: UP, 1: DOWN, 2: LEFT, 3: RIGHT]
         self.action_space = spaces.Discrete(4)
 
-        # Observation: a state represented as a matrix
-        # Includes the snake's position, food position, and collisions
-        self.observation_space = spaces.Box(
-            low=0,
-            high=1,
-            shape=(self.height // self.cell_size, self.width // self.cell_size),
-            dtype=np.int32
-        )
+        # Observation: the 7-vector built by _get_observation, or with observation='grid'
+        # the whole board as uint8 channels [body, head, food] kept up to date move by move
+        if observation == 'features':
+            low, high = feature_bounds(self.width, self.height, self.cell_size)
+            self.observation_space = spaces.Box(low=low, high=high, dtype=np.float32)
+            self.grid = None
+        elif observation == 'grid':
+            self.observation_space = spaces.Box(low=0, high=1, shape=(3, rows, columns), dtype=np.uint8)
+            self.grid = np.zeros((3, rows, columns), dtype=np.uint8)
+            # Read-only view handed out as the observation: no copy, but it changes with the next step
+            self.grid_view = self.grid.view()
+            self.grid_view.flags.writeable = False
+        else:
+            raise ValueError(f"Unknown observation mode: {observation}")
+
+        # Own generator for food placement: a seed and the action sequence fully determine an episode
+        self.rng = random.Random(seed)
 
         # Initialize the state
         self.reset()
@@ -65,14 +92,34 @@ class SnakeEnv(gym.Env):
                 pygame.quit()
                 sys.exit()
 
-    def reset(self):
-        """Resets the environment for a new episode."""
-        self.snake = [(100, 100), (80, 100), (60, 100)]
+    def reset(self, seed=None):
+        """Resets the environment for a new episode, reseeding the food generator if a seed is given."""
+        if seed is not None:
+            self.rng.seed(seed)
+        self.snake = deque([(100, 100), (80, 100), (60, 100)])
+        # Occupancy grid of the snake body; rows are rounded up because the
+        # bottom bound is checked against the raw height (750 is not a multiple of 20)
+        self.occupied = np.zeros((-(-self.height // self.cell_size), -(-self.width // self.cell_size)), dtype=bool)
+        # Swap-remove index of the cells food can spawn on: free_cells[free_pos[c]] == c
+        n_cells = (self.width // self.cell_size) * (self.height // self.cell_size)
+        self.free_cells = list(range(n_cells))
+        self.free_pos = list(range(n_cells))
+        for segment in self.snake:
+            self._set_occupied(segment, True)
         self.direction = (self.cell_size, 0)  # Initial movement to the right
         self.food = self._spawn_food()
         self.done = False
+        self.board_full = False
         self.score = 0
 
+        if self.grid is not None:
+            self.grid.fill(0)
+            for segment in self.snake:
+                self._draw(BODY, segment, 1)
+            self._draw(BODY, self.snake[0], 0)
+            self._draw(HEAD, self.snake[0], 1)
+            self._draw(FOOD, self.food, 1)
+
         return self._get_observation()
 
     def step(self, action):
@@ -95,16 +142,37 @@ class SnakeEnv(gym.Env):
 
         # Move the snake
         new_head = (self.snake[0][0] + self.direction[0], self.snake[0][1] + self.direction[1])
-        self.snake.insert(0, new_head)
+        body_hit = self._is_occupied(new_head)
+        if self.grid is not None:
+            self._draw(HEAD, self.snake[0], 0)
+            self._draw(BODY, self.snake[0], 1)
+            self._draw(HEAD, new_head, 1)
+        self.snake.appendleft(new_head)
+        self._set_occupied(new_head, True)
 
         # Check if the snake eats the food
         reward = 0
         if self.snake[0] == self.food:
             self.score += 1
             reward = 1  # Positive reward for eating food
-            self.food = self._spawn_food()
+            food = self._spawn_food()
+            if food is None:
+                # The snake covers every cell: the episode ends as a win
+                self.board_full = True
+                self.done = True
+            else:
+                if self.grid is not None:
+                    self._draw(FOOD, self.food, 0)
+                    self._draw(FOOD, food, 1)
+                self.food = food
         else:
-            self.snake.pop()  # Remove the tail if no food is eaten
+            tail = self.snake.pop()  # Remove the tail if no food is eaten
+            if self.grid is not None:
+                self._draw(BODY, tail, 0)
+            if tail == new_head:
+                body_hit = False  # The head moved into the cell the tail just left
+            else:
+                self._set_occupied(tail, False)
 
         # Calculate the distance from the food after moving
         new_distance = abs(self.snake[0][0] - self.food[0]) + abs(self.snake[0][1] - self.food[1])
@@ -118,26 +186,62 @@ class SnakeEnv(gym.Env):
         # Check for collisions
         if (self.snake[0][0] < 0 or self.snake[0][0] >= self.width or
                 self.snake[0][1] < 0 or self.snake[0][1] >= self.height or
-                self.snake[0] in self.snake[1:]):
+                body_hit):
             self.done = True
             reward = -1  # Penalty for collision
 
-        return self._get_observation(), reward, self.done, {}
+        return self._get_observation(), reward, self.done, {'board_full': self.board_full}
 
     def close(self):
         """Closes the environment."""
         pygame.quit()
 
     def _spawn_food(self):
-        """Generates food at a random position."""
-        while True:
-            x = random.randint(0, (self.width // self.cell_size) - 1) * self.cell_size
-            y = random.randint(0, (self.height // self.cell_size) - 1) * self.cell_size
-            if (x, y) not in self.snake:
-                return (x, y)
+        """Generates food on a random free cell with a single draw, or returns None if the board is full."""
+        if not self.free_cells:
+            return None
+        cell = self.free_cells[self.rng.randrange(len(self.free_cells))]
+        columns = self.width // self.cell_size
+        return ((cell % columns) * self.cell_size, (cell // columns) * self.cell_size)
+
+    def _is_occupied(self, point):
+        """O(1) check of whether a cell is covered by the snake; off-board cells never are."""
+        x, y = point[0] // self.cell_size, point[1] // self.cell_size
+        if x < 0 or y < 0 or x >= self.occupied.shape[1] or y >= self.occupied.shape[0]:
+            return False
+        return self.occupied[y, x]
+
+    def _set_occupied(self, point, value):
+        """Marks or clears a snake cell in the occupancy grid and the free-cell index."""
+        x, y = point[0] // self.cell_size, point[1] // self.cell_size
+        if 0 <= x < self.occupied.shape[1] and 0 <= y < self.occupied.shape[0]:
+            self.occupied[y, x] = value
+        columns = self.width // self.cell_size
+        if not (0 <= x < columns and 0 <= y < self.height // self.cell_size):
+            return  # Food never spawns there (e.g. the partial bottom row)
+        cell = y * columns + x
+        if value and self.free_pos[cell] >= 0:
+            # Swap-remove: the last free cell takes the place of the occupied one
+            p = self.free_pos[cell]
+            last = self.free_cells.pop()
+            if last != cell:
+                self.free_cells[p] = last
+                self.free_pos[last] = p
+            self.free_pos[cell] = -1
+        elif not value and self.free_pos[cell] < 0:
+            self.free_pos[cell] = len(self.free_cells)
+            self.free_cells.append(cell)
+
+    def _draw(self, channel, point, value):
+        """Sets one cell of a grid channel; off-board points are skipped."""
+        x, y = point[0] // self.cell_size, point[1] // self.cell_size
+        if 0 <= x < self.grid.shape[2] and 0 <= y < self.grid.shape[1]:
+            self.grid[channel, y, x] = value
 
     def _get_observation(self):
         """Creates a more informative representation of the state."""
+        if self.grid is not None:
+            return self.grid_view
         head_x, head_y = self.snake[0]
         food_x, food_y = self.food
 
@@ -155,10 +259,10 @@ class SnakeEnv(gym.Env):
         dy = (food_y - head_y) / self.height
 
         # Imminent collisions
-        danger_up = (head_y - self.cell_size < 0) or ((head_x, head_y - self.cell_size) in self.snake)
-        danger_down = (head_y + self.cell_size >= self.height) or ((head_x, head_y + self.cell_size) in self.snake)
-        danger_left = (head_x - self.cell_size < 0) or ((head_x - self.cell_size, head_y) in self.snake)
-        danger_right = (head_x + self.cell_size >= self.width) or ((head_x + self.cell_size, head_y) in self.snake)
+        danger_up = (head_y - self.cell_size < 0) or self._is_occupied((head_x, head_y - self.cell_size))
+        danger_down = (head_y + self.cell_size >= self.height) or self._is_occupied((head_x, head_y + self.cell_size))
+        danger_left = (head_x - self.cell_size < 0) or self._is_occupied((head_x - self.cell_size, head_y))
+        danger_right = (head_x + self.cell_size >= self.width) or self._is_occupied((head_x + self.cell_size, head_y))
 
         collision_risks = [int(danger_up), int(danger_down), int(danger_left), int(danger_right)]
 
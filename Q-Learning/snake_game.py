@@ -32,7 +32,8 @@ def main():
     # snake initial status
     snake = [(100, 100), (80, 100), (60, 100)]  # starting coordinates
     direction = (CELL_SIZE, 0)  # starts moving to the right
-    food = spawn_food(snake)
+    free_cells, free_pos = init_free_cells(snake)
+    food = spawn_food(free_cells)
 
     score = 0  # score
 
@@ -57,13 +58,20 @@ def main():
         # snake movements
         new_head = (snake[0][0] + direction[0], snake[0][1] + direction[1])
         snake.insert(0, new_head)
+        take_cell(free_cells, free_pos, new_head)
 
         # food collision control
         if snake[0] == food:
             score += 1
-            food = spawn_food(snake)
+            food = spawn_food(free_cells)
+            if food is None:  # snake covers the whole board
+                print(f"You win! Punteggio: {score}")
+                pygame.quit()
+                sys.exit()
         else:
-            snake.pop()  # remove tail if he didn't eat
+            tail = snake.pop()  # remove tail if he didn't eat
+            if tail != new_head:
+                release_cell(free_cells, free_pos, tail)
 
         # collision with borders or himself
         if (snake[0][0] < 0 or snake[0][0] >= WIDTH or
@@ -95,13 +103,51 @@ def draw_food(food):
     pygame.draw.rect(screen, RED, (food[0], food[1], CELL_SIZE, CELL_SIZE))
 
 
-# random food spawn
-def spawn_food(snake):
-    while True:
-        x = random.randint(0, (WIDTH // CELL_SIZE) - 1) * CELL_SIZE
-        y = random.randint(0, (HEIGHT // CELL_SIZE) - 1) * CELL_SIZE
-        if (x, y) not in snake:  # make sure food doesn't spawn on snake
-            return (x, y)
+# free cells index: free_cells lists the cells not covered by the snake,
+# free_pos[cell] is the position of cell in free_cells (-1 if covered)
+def init_free_cells(snake):
+    n_cells = (WIDTH // CELL_SIZE) * (HEIGHT // CELL_SIZE)
+    free_cells = list(range(n_cells))
+    free_pos = list(range(n_cells))
+    for segment in snake:
+        take_cell(free_cells, free_pos, segment)
+    return free_cells, free_pos
+
+
+def cell_index(point):
+    x, y = point[0] // CELL_SIZE, point[1] // CELL_SIZE
+    if 0 <= x < WIDTH // CELL_SIZE and 0 <= y < HEIGHT // CELL_SIZE:
+        return y * (WIDTH // CELL_SIZE) + x
+    return None  # out of the board
+
+
+def take_cell(free_cells, free_pos, point):
+    cell = cell_index(point)
+    if cell is None or free_pos[cell] < 0:
+        return
+    # swap-remove: the last free cell takes the place of the covered one
+    p = free_pos[cell]
+    last = free_cells.pop()
+    if last != cell:
+        free_cells[p] = last
+        free_pos[last] = p
+    free_pos[cell] = -1
+
+
+def release_cell(free_cells, free_pos, point):
+    cell = cell_index(point)
+    if cell is None or free_pos[cell] >= 0:
+        return
+    free_pos[cell] = len(free_cells)
+    free_cells.append(cell)
+
+
+# random food spawn: a single draw among the free cells, None if the board is full
+def spawn_food(free_cells):
+    if not free_cells:
+        return None
+    cell = free_cells[random.randrange(len(free_cells))]
+    return ((cell % (WIDTH // CELL_SIZE)) * CELL_SIZE, (cell // (WIDTH // CELL_SIZE)) * CELL_SIZE)
 
 # draw score
 def draw_score(score):
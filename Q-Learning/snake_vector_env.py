@@ -0,0 +1,338 @@
+import multiprocessing as mp
+
+import numpy as np
+from gym import spaces
+from gym.vector import VectorEnv
+
+from snake_env import BODY, HEAD, FOOD, feature_bounds
+
+# Action codes of SnakeEnv: 0: UP, 1: DOWN, 2: LEFT, 3: RIGHT
+DIR_DX = np.array([0, 0, -1, 1])
+DIR_DY = np.array([-1, 1, 0, 0])
+OPPOSITE = np.array([1, 0, 3, 2])
+
+
+class SnakeVectorEnv(VectorEnv):
+    """num_envs SnakeEnv boards stepped together in NumPy, with gym's vector-env API.
+
+    reset() returns (observations, infos) and step() returns (observations,
+    rewards, terminated, truncated, infos), one row per board. Boards that
+    finish are reset inside step(): their last observation and info go in
+    infos["final_observation"] and infos["final_info"], masked by
+    infos["_final_observation"] and infos["_final_info"], as in gym's own
+    vector envs. final_info also holds the episode's score and steps. The
+    dynamics, rewards and observations are those of SnakeEnv.
+
+    Positions are kept in cells. Each snake is a ring buffer of flat cell
+    indices with an occupancy grid and a swap-remove index of the cells food
+    can spawn on, so a step costs the same whatever the snake length.
+
+    With observation='grid' the observations are the boards themselves, a
+    (num_envs, 3, rows, columns) uint8 array of [body, head, food] channels
+    as in SnakeEnv. Each step only rewrites the cells that changed, and the
+    array returned is a read-only view of it that the next step overwrites.
+
+    With max_episode_steps set, an episode still running after that many
+    steps ends with truncated=True, like gym's TimeLimit wrapper.
+    """
+
+    def __init__(self, num_envs, seed=None, width=1400, height=750, cell_size=20, observation='features',
+                 max_episode_steps=None):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        # The head may sit on the partial bottom row, food only spawns on full rows
+        self.columns = width // cell_size
+        self.rows = -(-height // cell_size)
+        self.food_rows = height // cell_size
+        self.n_cells = self.columns * self.rows
+        self.n_food_cells = self.columns * self.food_rows
+        if observation == 'features':
+            low, high = feature_bounds(width, height, cell_size)
+            observation_space = spaces.Box(low=low, high=high, dtype=np.float32)
+            self.grid = None
+        elif observation == 'grid':
+            observation_space = spaces.Box(low=0, high=1, shape=(3, self.rows, self.columns), dtype=np.uint8)
+            self.grid = np.zeros((num_envs, 3, self.rows, self.columns), dtype=np.uint8)
+            self.cells = self.grid.reshape(num_envs, 3, self.n_cells)  # Same memory, indexed by flat cell
+            self.grid_view = self.grid.view()
+            self.grid_view.flags.writeable = False
+        else:
+            raise ValueError(f'Unknown observation mode: {observation}')
+        super().__init__(num_envs, observation_space, spaces.Discrete(4))
+        self.rng = np.random.default_rng(seed)
+
+        n = num_envs
+        self.env_ids = np.arange(n)
+        self.head = np.zeros((n, 2), dtype=np.int64)  # (x, y) in cells
+        self.direction = np.zeros(n, dtype=np.int64)
+        self.food = np.zeros((n, 2), dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.max_episode_steps = max_episode_steps
+        self.episode_steps = np.zeros(n, dtype=np.int64)
+
+        # Body ring buffer: the head is body[i, body_head[i]], the tail body[i, body_head[i] - length[i] + 1]
+        self.body = np.zeros((n, self.n_cells + 1), dtype=np.int64)
+        self.body_head = np.zeros(n, dtype=np.int64)
+        self.length = np.zeros(n, dtype=np.int64)
+        self.occupied = np.zeros((n, self.n_cells), dtype=bool)
+
+        # free[i, :n_free[i]] lists the food cells off the snake, free_pos[i, c] is c's slot there (-1 if taken)
+        self.free = np.zeros((n, self.n_food_cells), dtype=np.int64)
+        self.free_pos = np.zeros((n, self.n_food_cells), dtype=np.int64)
+        self.n_free = np.zeros(n, dtype=np.int64)
+
+        self._reset_boards(self.env_ids)
+
+    def reset(self, *, seed=None, options=None):
+        """Resets every board, reseeding the food generator if a seed is given."""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_boards(self.env_ids)
+        return self._observations(), {}
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.int64)
+        ids = self.env_ids
+
+        # Reversing into the body is ignored, as in SnakeEnv.step
+        self.direction = np.where(actions == OPPOSITE[self.direction], self.direction, actions)
+        old_distance = np.abs(self.head - self.food).sum(axis=1)
+        if self.grid is not None:
+            old_head = self.head[:, 1] * self.columns + self.head[:, 0]
+            self.cells[ids, HEAD, old_head] = 0
+            self.cells[ids, BODY, old_head] = 1
+
+        self.head[:, 0] += DIR_DX[self.direction]
+        self.head[:, 1] += DIR_DY[self.direction]
+        x, y = self.head[:, 0], self.head[:, 1]
+        on_board = (x >= 0) & (x < self.columns) & (y >= 0) & (y < self.rows)
+        cell = np.where(on_board, y * self.columns + x, 0)
+        body_hit = on_board & self.occupied[ids, cell]
+
+        # Push the new head; off-board heads are never marked
+        self.body_head = (self.body_head + 1) % self.body.shape[1]
+        self.body[ids, self.body_head] = cell
+        self.length += 1
+        marked = ids[on_board]
+        self.occupied[marked, cell[marked]] = True
+        self._take_cell(marked, cell[marked])
+        if self.grid is not None:
+            self.cells[marked, HEAD, cell[marked]] = 1
+
+        reward = np.zeros(self.num_envs)
+        eaten = (x == self.food[:, 0]) & (y == self.food[:, 1])
+        ate = ids[eaten]
+        self.score[ate] += 1
+        reward[ate] = 1
+        board_full = np.zeros(self.num_envs, dtype=bool)
+        board_full[ate] = self.n_free[ate] == 0
+        fed = ids[eaten & ~board_full]
+        if self.grid is not None:
+            self.cells[fed, FOOD, self.food[fed, 1] * self.columns + self.food[fed, 0]] = 0
+        self._place_food(fed)
+        if self.grid is not None:
+            self.cells[fed, FOOD, self.food[fed, 1] * self.columns + self.food[fed, 0]] = 1
+
+        # Pop the tail of every snake that did not eat
+        starved = ids[~eaten]
+        tail = self.body[starved, (self.body_head[starved] - self.length[starved] + 1) % self.body.shape[1]]
+        self.length[starved] -= 1
+        if self.grid is not None:
+            self.cells[starved, BODY, tail] = 0
+        into_tail = tail == cell[starved]
+        body_hit[starved[into_tail]] = False  # The head moved into the cell the tail just left
+        released, tail = starved[~into_tail], tail[~into_tail]
+        self.occupied[released, tail] = False
+        self._release_cell(released, tail)
+
+        new_distance = np.abs(self.head - self.food).sum(axis=1)
+        reward += np.where(new_distance < old_distance, 0.1, -0.1)
+        collision = ~on_board | body_hit
+        reward[collision] = -1
+        terminated = collision | board_full
+        self.episode_steps += 1
+        if self.max_episode_steps is None:
+            truncated = np.zeros(self.num_envs, dtype=bool)
+        else:
+            truncated = ~terminated & (self.episode_steps >= self.max_episode_steps)
+
+        observations = self._observations()
+        infos = {'board_full': board_full, '_board_full': np.ones(self.num_envs, dtype=bool)}
+        done = np.flatnonzero(terminated | truncated)
+        if len(done):
+            final_observation = np.full(self.num_envs, None, dtype=object)
+            final_info = np.full(self.num_envs, None, dtype=object)
+            for i in done:
+                final_observation[i] = observations[i].copy()  # The grid view is about to be redrawn
+                final_info[i] = {'board_full': bool(board_full[i]), 'score': int(self.score[i]),
+                                 'steps': int(self.episode_steps[i])}
+            mask = terminated | truncated
+            infos.update(final_observation=final_observation, _final_observation=mask,
+                         final_info=final_info, _final_info=mask.copy())
+            self._reset_boards(done)
+            if self.grid is None:
+                observations[done] = self._observations(done)
+        return observations, reward, terminated, truncated, infos
+
+    def _reset_boards(self, env_ids):
+        x, y = 100 // self.cell_size, 100 // self.cell_size
+        cells = y * self.columns + np.array([x - 2, x - 1, x])  # tail -> head
+
+        self.direction[env_ids] = 3  # RIGHT
+        self.head[env_ids] = (x, y)
+        self.occupied[env_ids] = False
+        self.occupied[env_ids[:, None], cells] = True
+        self.body[env_ids, :3] = cells
+        self.body_head[env_ids] = 2
+        self.length[env_ids] = 3
+        self.free[env_ids] = np.arange(self.n_food_cells)
+        self.free_pos[env_ids] = np.arange(self.n_food_cells)
+        self.n_free[env_ids] = self.n_food_cells
+        for cell in cells:
+            self._take_cell(env_ids, np.full(len(env_ids), cell))
+        self.score[env_ids] = 0
+        self.episode_steps[env_ids] = 0
+        self._place_food(env_ids)
+
+        if self.grid is not None:
+            self.grid[env_ids] = 0
+            self.cells[env_ids[:, None], BODY, cells[:-1]] = 1
+            self.cells[env_ids, HEAD, cells[-1]] = 1
+            self.cells[env_ids, FOOD, self.food[env_ids, 1] * self.columns + self.food[env_ids, 0]] = 1
+
+    def _place_food(self, env_ids):
+        # A single draw among the free cells, whatever the snake length
+        k = self.rng.integers(0, self.n_free[env_ids])
+        cells = self.free[env_ids, k]
+        self.food[env_ids, 0] = cells % self.columns
+        self.food[env_ids, 1] = cells // self.columns
+
+    def _take_cell(self, env_ids, cells):
+        # Only food cells are indexed; the partial bottom row is skipped
+        keep = cells < self.n_food_cells
+        env_ids, cells = env_ids[keep], cells[keep]
+        p = self.free_pos[env_ids, cells]
+        last = self.free[env_ids, self.n_free[env_ids] - 1]
+        self.free[env_ids, p] = last
+        self.free_pos[env_ids, last] = p
+        self.free_pos[env_ids, cells] = -1
+        self.n_free[env_ids] -= 1
+
+    def _release_cell(self, env_ids, cells):
+        keep = cells < self.n_food_cells
+        env_ids, cells = env_ids[keep], cells[keep]
+        k = self.n_free[env_ids]
+        self.free[env_ids, k] = cells
+        self.free_pos[env_ids, cells] = k
+        self.n_free[env_ids] += 1
+
+    def _observations(self, env_ids=None):
+        """The SnakeEnv 7-vector of each board, as a (len(env_ids), 7) float32 array."""
+        if self.grid is not None:
+            return self.grid_view if env_ids is None else self.grid_view[env_ids]
+        if env_ids is None:
+            env_ids = self.env_ids
+        head_x, head_y = self.head[env_ids, 0], self.head[env_ids, 1]
+        obs = np.empty((len(env_ids), 7), dtype=np.float32)
+        obs[:, 0] = self.direction[env_ids]
+        obs[:, 1] = (self.food[env_ids, 0] - head_x) * self.cell_size / self.width
+        obs[:, 2] = (self.food[env_ids, 1] - head_y) * self.cell_size / self.height
+
+        # Each danger checks the bound on its own axis, then the body; off-board cells are never occupied
+        for column, dx, dy in ((3, 0, -1), (4, 0, 1), (5, -1, 0), (6, 1, 0)):
+            x, y = head_x + dx, head_y + dy
+            on_board = (x >= 0) & (x < self.columns) & (y >= 0) & (y < self.rows)
+            hit = on_board & self.occupied[env_ids, np.where(on_board, y * self.columns + x, 0)]
+            if dy < 0:
+                hit |= y < 0
+            elif dy > 0:
+                hit |= y * self.cell_size >= self.height
+            elif dx < 0:
+                hit |= x < 0
+            else:
+                hit |= x * self.cell_size >= self.width
+            obs[:, column] = hit
+        return obs
+
+
+def _shard_worker(remote, num_envs, seed, observation, max_episode_steps):
+    env = SnakeVectorEnv(num_envs, seed, observation=observation, max_episode_steps=max_episode_steps)
+    while True:
+        command, data = remote.recv()
+        if command == 'step':
+            remote.send(env.step(data))
+        elif command == 'reset':
+            remote.send(env.reset(seed=data))
+        else:
+            remote.close()
+            return
+
+
+def _merge_infos(infos, sizes):
+    """Concatenates the per-shard info dicts, filling keys a shard did not return."""
+    merged = {}
+    for key in set().union(*infos):
+        parts = []
+        for info, n in zip(infos, sizes):
+            if key in info:
+                parts.append(info[key])
+            elif key.startswith('_'):
+                parts.append(np.zeros(n, dtype=bool))
+            else:
+                parts.append(np.full(n, None, dtype=object))
+        merged[key] = np.concatenate(parts)
+    return merged
+
+
+class AsyncSnakeVectorEnv(VectorEnv):
+    """SnakeVectorEnv split into shards that step in parallel worker processes.
+
+    Each worker runs a whole SnakeVectorEnv of num_envs // num_workers boards,
+    so a call moves one NumPy batch per process rather than one board. Results
+    are concatenated in shard order. Follows gym's step_async/step_wait API.
+    """
+
+    def __init__(self, num_envs, num_workers=None, seed=None, observation='features', max_episode_steps=None):
+        template = SnakeVectorEnv(1, observation=observation)
+        super().__init__(num_envs, template.single_observation_space, spaces.Discrete(4))
+        num_workers = min(num_workers or mp.cpu_count(), num_envs)
+        self.sizes = [len(shard) for shard in np.array_split(np.arange(num_envs), num_workers)]
+        self.bounds = np.cumsum(self.sizes)[:-1]
+        self.seed = seed
+        self.remotes = []
+        self.processes = []
+        for i, size in enumerate(self.sizes):
+            remote, worker_remote = mp.Pipe()
+            shard_seed = None if seed is None else seed + i
+            p = mp.Process(target=_shard_worker,
+                           args=(worker_remote, size, shard_seed, observation, max_episode_steps), daemon=True)
+            p.start()
+            worker_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(p)
+
+    def reset_async(self, seed=None, options=None):
+        for i, remote in enumerate(self.remotes):
+            remote.send(('reset', None if seed is None else seed + i))
+
+    def reset_wait(self, seed=None, options=None):
+        results = [remote.recv() for remote in self.remotes]
+        observations, infos = zip(*results)
+        return np.concatenate(observations), _merge_infos(infos, self.sizes)
+
+    def step_async(self, actions):
+        for remote, shard in zip(self.remotes, np.split(np.asarray(actions), self.bounds)):
+            remote.send(('step', shard))
+
+    def step_wait(self):
+        results = [remote.recv() for remote in self.remotes]
+        observations, rewards, terminated, truncated, infos = zip(*results)
+        return (np.concatenate(observations), np.concatenate(rewards), np.concatenate(terminated),
+                np.concatenate(truncated), _merge_infos(infos, self.sizes))
+
+    def close_extras(self, **kwargs):
+        for remote in self.remotes:
+            remote.send(('close', None))
+        for p in self.processes:
+            p.join()
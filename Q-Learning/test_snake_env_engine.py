@@ -0,0 +1,112 @@
+"""Differential test: SnakeEnv (deque + occupancy grid) against the original
+list-based engine on seeded random games.
+
+The two engines draw food differently, so the reference takes each new
+food position from SnakeEnv; everything else must match on every step.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from snake_env import SnakeEnv
+
+
+class ListSnakeEnv:
+    """step and _get_observation of the original SnakeEnv, with the body in a list."""
+
+    def __init__(self, food, width=1400, height=750, cell_size=20):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.snake = [(100, 100), (80, 100), (60, 100)]
+        self.direction = (self.cell_size, 0)
+        self.food = tuple(food)
+        self.done = False
+        self.score = 0
+
+    def step(self, action, next_food):
+        if action == 0:
+            if self.direction != (0, self.cell_size):
+                self.direction = (0, -self.cell_size)
+        elif action == 1:
+            if self.direction != (0, -self.cell_size):
+                self.direction = (0, self.cell_size)
+        elif action == 2:
+            if self.direction != (self.cell_size, 0):
+                self.direction = (-self.cell_size, 0)
+        elif action == 3:
+            if self.direction != (-self.cell_size, 0):
+                self.direction = (self.cell_size, 0)
+
+        old_distance = abs(self.snake[0][0] - self.food[0]) + abs(self.snake[0][1] - self.food[1])
+        new_head = (self.snake[0][0] + self.direction[0], self.snake[0][1] + self.direction[1])
+        self.snake.insert(0, new_head)
+
+        reward = 0
+        if self.snake[0] == self.food:
+            self.score += 1
+            reward = 1
+            self.food = tuple(next_food)
+        else:
+            self.snake.pop()
+
+        new_distance = abs(self.snake[0][0] - self.food[0]) + abs(self.snake[0][1] - self.food[1])
+        if new_distance < old_distance:
+            reward += 0.1
+        else:
+            reward -= 0.1
+
+        if (self.snake[0][0] < 0 or self.snake[0][0] >= self.width or
+                self.snake[0][1] < 0 or self.snake[0][1] >= self.height or
+                self.snake[0] in self.snake[1:]):
+            self.done = True
+            reward = -1
+
+        return self._get_observation(), reward, self.done
+
+    def _get_observation(self):
+        head_x, head_y = self.snake[0]
+        food_x, food_y = self.food
+        direction = {(0, -self.cell_size): 0, (0, self.cell_size): 1,
+                     (-self.cell_size, 0): 2, (self.cell_size, 0): 3}[self.direction]
+        dx = (food_x - head_x) / self.width
+        dy = (food_y - head_y) / self.height
+        danger_up = (head_y - self.cell_size < 0) or ((head_x, head_y - self.cell_size) in self.snake)
+        danger_down = (head_y + self.cell_size >= self.height) or ((head_x, head_y + self.cell_size) in self.snake)
+        danger_left = (head_x - self.cell_size < 0) or ((head_x - self.cell_size, head_y) in self.snake)
+        danger_right = (head_x + self.cell_size >= self.width) or ((head_x + self.cell_size, head_y) in self.snake)
+        risks = [int(danger_up), int(danger_down), int(danger_left), int(danger_right)]
+        return np.array([direction, dx, dy] + risks, dtype=np.float32)
+
+
+def steer(rng, env):
+    # Mostly towards the food, so snakes grow long enough to hit themselves
+    if rng.random() < 0.3:
+        return rng.randrange(4)
+    (head_x, head_y), (food_x, food_y) = env.snake[0], env.food
+    if food_x != head_x:
+        return 3 if food_x > head_x else 2
+    return 1 if food_y > head_y else 0
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_matches_list_engine(seed):
+    rng = random.Random(seed)
+    env = SnakeEnv(seed=seed)
+    reference = ListSnakeEnv(env.food)
+
+    for step in range(20_000):
+        action = steer(rng, env)
+        obs, reward, done, _ = env.step(action)
+        ref_obs, ref_reward, ref_done = reference.step(action, env.food)
+        assert ref_reward == reward, step
+        assert ref_done == done, step
+        assert (ref_obs == obs).all(), step
+        assert reference.snake[0] == env.snake[0], step
+        assert reference.snake == list(env.snake), step
+        assert reference.food == env.food, step
+
+        if done:
+            env.reset()
+            reference = ListSnakeEnv(env.food)
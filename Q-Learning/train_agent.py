@@ -1,90 +1,153 @@
+import os
 import numpy as np
 import random
 from snake_env import SnakeEnv
+from q_table import discretize_state, encode_states, load_q_table, new_q_table, save_checkpoint, load_checkpoint, header_path
 
 # Q-Learning parameters
 alpha = 0.01       # Learning rate
 gamma = 0.9       # Discount factor
-epsilon = 1,0     # Initial exploration probability
+epsilon = 1.0     # Initial exploration probability
 epsilon_decay = 0.9995  # Reduction of epsilon in each episode
 epsilon_min = 0.01     # Minimum value of epsilon
 num_episodes = 2000000   # Total number of episodes
+dense = True      # Dense float32 Q-array indexed by encode_states instead of a dict
+save_every = 10000  # Episodes between checkpoints (dense mode)
 
-# Function to discretize the state
-def discretize_state(state):
-    """Transforms the continuous state into a discrete one for the Q-table."""
-    direction = int(state[0])  # Snake's direction
-    dx = int((state[1] + 1) * 5)  # Transform from [-1, 1] to [0, 10]
-    dy = int((state[2] + 1) * 5)  # Same for dy
+q_table_path = "last2.npy"
 
-    collision_risks = tuple(map(int, state[3:7]))  # Binary collision risks
 
-    # Return the discretized state as a tuple
-    return (direction, dx, dy) + collision_risks
+def hyperparameters():
+    """Returns the Q-learning settings recorded in checkpoint headers."""
+    return {"alpha": alpha, "gamma": gamma, "epsilon_decay": epsilon_decay, "epsilon_min": epsilon_min}
 
-# Initialize the Snake environment
-env = SnakeEnv()
 
-# Initialize the Q-Table as a dictionary
-try:
-    q_table = np.load("last2.npy", allow_pickle=True).item()
-    print("Q-Table loaded successfully.")
-except FileNotFoundError:
-    q_table = {}
+def epsilon_at(episode, start=1.0):
+    """Epsilon used by the given episode under the per-episode decay schedule."""
+    return max(epsilon_min, start * epsilon_decay ** episode)
 
-# Function to choose an action using epsilon-greedy
-def choose_action(state):
-    """
-    Choose an action based on the epsilon-greedy strategy.
-    """
-    state_key = tuple(state)  # Convert the state to a tuple for the Q-Table
-    if random.uniform(0, 1) < epsilon:  # Exploration
-        return env.action_space.sample()
-    else:  # Exploitation
-        if state_key not in q_table:
-            q_table[state_key] = [0] * env.action_space.n
-        return np.argmax(q_table[state_key])
-
-# Main loop for training
-for episode in range(num_episodes):
-    state = discretize_state(env.reset())
+
+def train_dict(env, q_table, num_episodes, epsilon):
+    """Original training loop on a Q-table dict keyed by `state + (action,)`."""
+    for episode in range(num_episodes):
+        state = discretize_state(env.reset())
+        total_reward = 0
+
+        while True:
+            # Epsilon-greedy policy
+            if np.random.rand() < epsilon:
+                action = env.action_space.sample()  # Explore
+            else:
+                action = np.argmax([q_table.get(state + (a,), 0) for a in range(env.action_space.n)])
+
+            # Execute the action
+            next_state, reward, done, _ = env.step(action)
+            next_state = discretize_state(next_state)
+
+            # Update the Q-table
+            best_next_action = np.max([q_table.get(next_state + (a,), 0) for a in range(env.action_space.n)])
+            q_table[state + (action,)] = q_table.get(state + (action,), 0) + alpha * (
+                reward + gamma * best_next_action - q_table.get(state + (action,), 0)
+            )
+
+            state = next_state
+            total_reward += reward
+
+            if done:
+                break
+
+        # Reduce epsilon
+        epsilon = max(epsilon_min, epsilon * epsilon_decay)
+
+        # Log every 100 episodes
+        if episode % 100 == 0:
+            print(f"Episode {episode}: Total reward: {total_reward} Epsilon: {epsilon}")
+
+    return q_table
+
+
+def run_dense_episode(env, q_table, epsilon):
+    """Plays one epsilon-greedy episode, updating a dense Q-table in place; returns (total_reward, steps)."""
+    state = encode_states(env.reset())
     total_reward = 0
+    steps = 0
 
     while True:
         # Epsilon-greedy policy
         if np.random.rand() < epsilon:
             action = env.action_space.sample()  # Explore
         else:
-            action = np.argmax([q_table.get(state + (a,), 0) for a in range(env.action_space.n)])
+            action = q_table[state].argmax()
 
         # Execute the action
         next_state, reward, done, _ = env.step(action)
-        next_state = discretize_state(next_state)
+        next_state = encode_states(next_state)
 
         # Update the Q-table
-        best_next_action = np.max([q_table.get(next_state + (a,), 0) for a in range(env.action_space.n)])
-        q_table[state + (action,)] = q_table.get(state + (action,), 0) + alpha * (
-            reward + gamma * best_next_action - q_table.get(state + (action,), 0)
-        )
+        q_table[state, action] += alpha * (reward + gamma * q_table[next_state].max() - q_table[state, action])
 
         state = next_state
         total_reward += reward
+        steps += 1
 
         if done:
-            break
+            return total_reward, steps
+
 
-    # Reduce epsilon
-    epsilon = max(epsilon_min, epsilon * epsilon_decay)
+def train_dense(env, q_table, num_episodes, epsilon, start_episode=0, checkpoint_path=None):
+    """Same loop on a dense (N_STATES, N_ACTIONS) array: greedy choice and update are single indexed operations.
 
-    # Log every 100 episodes
-    if episode % 100 == 0:
-        print(f"Episode {episode}: Total reward: {total_reward} Epsilon: {epsilon}")
+    With a checkpoint_path the table is saved every save_every episodes, so a
+    crashed run resumes from the last checkpoint instead of from scratch.
+    """
+    for episode in range(start_episode, num_episodes):
+        total_reward, _ = run_dense_episode(env, q_table, epsilon)
+
+        # Reduce epsilon
+        epsilon = max(epsilon_min, epsilon * epsilon_decay)
+
+        # Log every 100 episodes
+        if episode % 100 == 0:
+            print(f"Episode {episode}: Total reward: {total_reward} Epsilon: {epsilon}")
+
+        if checkpoint_path and (episode + 1) % save_every == 0:
+            save_checkpoint(checkpoint_path, q_table, episode + 1, hyperparameters(), epsilon=epsilon)
+
+    if checkpoint_path:
+        save_checkpoint(checkpoint_path, q_table, num_episodes, hyperparameters(), epsilon=epsilon)
+    return q_table
+
+
+if __name__ == "__main__":
+    # Initialize the Snake environment
+    env = SnakeEnv()
+
+    # Initialize the Q-Table, resuming from the last saved one if present
+    start_episode = 0
+    try:
+        if dense and os.path.exists(header_path(q_table_path)):
+            q_table, header = load_checkpoint(q_table_path)
+            q_table = np.array(q_table)  # Writable copy of the memory-mapped table
+            start_episode = header["episodes"] or 0
+            epsilon = header.get("epsilon", epsilon)
+        elif dense:
+            q_table = np.array(load_q_table(q_table_path))
+        else:
+            q_table = np.load(q_table_path, allow_pickle=True).item()
+        print(f"Q-Table loaded successfully (episode {start_episode}).")
+    except FileNotFoundError:
+        q_table = new_q_table() if dense else {}
 
-# Close the environment
-env.close()
+    if dense:
+        q_table = train_dense(env, q_table, num_episodes, epsilon, start_episode, q_table_path)
+    else:
+        q_table = train_dict(env, q_table, num_episodes, epsilon)
 
-# Save the Q-Table to a file
-np.save("last2.npy", q_table)
+    # Close the environment
+    env.close()
 
-print("Training completed! Q-Table saved in 'final2_q_table.npy'.")
+    # Save the Q-Table to a file (dense mode has already written its final checkpoint)
+    if not dense:
+        np.save(q_table_path, q_table)
 
+    print(f"Training completed! Q-Table saved in '{q_table_path}'.")
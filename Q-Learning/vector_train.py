@@ -0,0 +1,198 @@
+import argparse
+import time
+
+import numpy as np
+
+import train_agent
+from background_eval import BackgroundEvaluator
+from q_table import N_ACTIONS, encode_states, new_q_table, load_checkpoint, save_checkpoint
+from snake_env import SnakeEnv
+from snake_vector_env import SnakeVectorEnv
+
+NUM_ENVS = 256  # Boards stepped together
+EVAL_STEPS = 5000  # Greedy games still running after this many steps are cut off
+
+
+def final_observations(next_obs, infos):
+    """Next observations with the last observation of finished boards in place of the reset one."""
+    if "_final_observation" not in infos:
+        return next_obs
+    next_obs = next_obs.copy()
+    done = np.flatnonzero(infos["_final_observation"])
+    next_obs[done] = np.stack(infos["final_observation"][done])
+    return next_obs
+
+
+def batch_update(q_table, states, actions, targets, alpha):
+    """Applies Q[s, a] += alpha * (target - Q[s, a]) for a whole batch of transitions.
+
+    When k transitions in the batch share a state-action, the result is the
+    one of the k updates applied one after another (targets stay those of
+    the pre-batch table): Q <- (1 - alpha)^k Q + sum_j alpha (1 - alpha)^(k - j) t_j.
+    A plain np.add.at of the k deltas would instead step k times as far from
+    the same old value.
+    """
+    q_flat = q_table.reshape(-1)
+    index = states * N_ACTIONS + actions
+    order = np.argsort(index, kind="stable")
+    index = index[order]
+
+    # Runs of equal indices: k is the run length, j the position in the run (1-based)
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    counts = np.diff(np.r_[starts, len(index)])
+    k = np.repeat(counts, counts)
+    j = np.arange(len(index)) - np.repeat(starts, counts) + 1
+
+    q_flat[index[starts]] *= (1 - alpha) ** counts
+    np.add.at(q_flat, index, alpha * (1 - alpha) ** (k - j) * targets[order])
+
+
+def train_vectorized(num_envs, num_episodes, q_table=None, checkpoint_path=None, seed=0, start_episode=0,
+                     evaluator=None):
+    """Tabular Q-learning on num_envs boards stepped together; returns (q_table, episodes/sec, steps/sec).
+
+    Every board plays its own episode with the epsilon of its global episode
+    number, as in the serial loop. States are encoded, actions chosen and the
+    Q-table updated for the whole batch with array operations. Episodes past
+    num_episodes are not started: their boards keep moving but stop learning.
+    With a background_eval.BackgroundEvaluator, a copy of the table is evaluated
+    in another process every evaluator.every episodes.
+    """
+    q_table = new_q_table() if q_table is None else q_table
+    rng = np.random.default_rng(seed)
+    env = SnakeVectorEnv(num_envs, seed=seed)
+    obs, _ = env.reset(seed=seed)
+    states = encode_states(obs)
+
+    episode = start_episode + np.arange(num_envs)  # Global episode number of each board
+    next_episode = start_episode + num_envs
+    total_reward = np.zeros(num_envs)
+    completed = start_episode
+    next_save = (completed // train_agent.save_every + 1) * train_agent.save_every
+    steps = 0
+
+    start = time.perf_counter()
+    while True:
+        active = episode < num_episodes
+        if not active.any():
+            break
+
+        # Epsilon-greedy policy for the whole batch
+        epsilon = np.maximum(train_agent.epsilon_min, train_agent.epsilon_decay ** episode)
+        actions = q_table[states].argmax(axis=1)
+        explore = rng.random(num_envs) < epsilon
+        actions[explore] = rng.integers(0, N_ACTIONS, explore.sum())
+
+        next_obs, rewards, terminated, truncated, infos = env.step(actions)
+        next_states = encode_states(final_observations(next_obs, infos))
+
+        # Same target as the serial loop, which also bootstraps from the last state
+        targets = rewards + train_agent.gamma * q_table[next_states].max(axis=1)
+        batch_update(q_table, states[active], actions[active], targets[active], train_agent.alpha)
+        steps += active.sum()
+        total_reward += rewards
+
+        done = np.flatnonzero((terminated | truncated) & active)
+        for i in done:
+            if episode[i] % 100 == 0:
+                print(f"Episode {episode[i]}: Total reward: {total_reward[i]} "
+                      f"Epsilon: {train_agent.epsilon_at(episode[i] + 1)}")
+        completed += len(done)
+        total_reward[done] = 0
+        episode[done] = next_episode + np.arange(len(done))
+        next_episode += len(done)
+        states = encode_states(next_obs)
+
+        if evaluator and evaluator.due(completed):
+            evaluator.submit(completed, q_table.copy())
+
+        if checkpoint_path and completed >= next_save:
+            save_checkpoint(checkpoint_path, q_table, completed, train_agent.hyperparameters(),
+                            epsilon=train_agent.epsilon_at(completed), envs=num_envs)
+            next_save += train_agent.save_every
+    elapsed = time.perf_counter() - start
+    if evaluator:
+        evaluator.close()
+
+    if checkpoint_path:
+        save_checkpoint(checkpoint_path, q_table, num_episodes, train_agent.hyperparameters(),
+                        epsilon=train_agent.epsilon_at(num_episodes), envs=num_envs)
+    return q_table, (num_episodes - start_episode) / elapsed, steps / elapsed
+
+
+def evaluate(q_table, num_games, num_envs=NUM_ENVS, seed=0):
+    """Plays num_games greedy games; returns the arrays of their scores and lengths in steps.
+
+    Each board plays exactly one game: keeping the first num_games episodes to
+    finish over fewer boards would favour short games. Beyond num_envs games,
+    they are played in groups of num_envs boards seeded seed, seed + 1, ...
+    """
+    scores = np.empty(num_games, dtype=np.int64)
+    lengths = np.empty(num_games, dtype=np.int64)
+    for k, first in enumerate(range(0, num_games, num_envs)):
+        n = min(num_envs, num_games - first)
+        env = SnakeVectorEnv(n, seed=seed + k, max_episode_steps=EVAL_STEPS)
+        obs, _ = env.reset(seed=seed + k)
+        running = np.ones(n, dtype=bool)
+        while running.any():
+            obs, _, _, _, infos = env.step(q_table[encode_states(obs)].argmax(axis=1))
+            if "_final_info" in infos:
+                # Boards restarted by the autoreset keep playing, but their later games are ignored
+                for i in np.flatnonzero(infos["_final_info"] & running):
+                    scores[first + i] = infos["final_info"][i]["score"]
+                    lengths[first + i] = infos["final_info"][i]["steps"]
+                running &= ~infos["_final_info"]
+    return scores, lengths
+
+
+def play_greedy(q_table, n_games, seed):
+    """Game function for background_eval.BackgroundEvaluator."""
+    return evaluate(q_table, n_games, seed=seed)
+
+
+def compare(num_envs, num_episodes, eval_games=1000, seed=0):
+    """Trains with train_dense and train_vectorized on the same episode budget and prints speed and greedy score."""
+    np.random.seed(seed)
+    env = SnakeEnv(seed=seed)
+    env.action_space.seed(seed)
+    start = time.perf_counter()
+    serial = train_agent.train_dense(env, new_q_table(), num_episodes, 1.0)
+    serial_rate = num_episodes / (time.perf_counter() - start)
+    vectorized, vectorized_rate, _ = train_vectorized(num_envs, num_episodes, seed=seed)
+
+    for name, q_table, rate in (("serial", serial, serial_rate), (f"{num_envs} envs", vectorized, vectorized_rate)):
+        scores, _ = evaluate(q_table, eval_games, seed=seed + 1)
+        print(f"{name:>10}: {rate:9.1f} episodes/s  greedy score mean {scores.mean():.2f} "
+              f"median {np.median(scores):.0f} max {scores.max()}")
+    print(f"speedup {vectorized_rate / serial_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tabular Q-learning on many boards stepped together")
+    parser.add_argument("--envs", type=int, default=NUM_ENVS)
+    parser.add_argument("--episodes", type=int, default=train_agent.num_episodes)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--resume", action="store_true", help=f"continue from the {train_agent.q_table_path} checkpoint")
+    parser.add_argument("--eval-every", type=int, default=0,
+                        help="episodes between greedy evaluations in a separate process (0 = none)")
+    parser.add_argument("--eval-games", type=int, default=100, help="seeded greedy games per evaluation")
+    parser.add_argument("--eval-out", default="eval_q_table.csv", help="CSV the evaluation results are appended to")
+    parser.add_argument("--compare", action="store_true",
+                        help="train serially and vectorized on --episodes and compare speed and greedy score")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.envs, args.episodes, seed=args.seed)
+    else:
+        initial, start_episode = None, 0
+        if args.resume:
+            initial, header = load_checkpoint(train_agent.q_table_path)
+            initial = np.array(initial)  # Writable copy of the memory-mapped table
+            start_episode = header["episodes"] or 0
+        evaluator = None
+        if args.eval_every:
+            evaluator = BackgroundEvaluator(play_greedy, args.eval_every, args.eval_games, args.seed, args.eval_out)
+        _, episodes_per_sec, _ = train_vectorized(args.envs, args.episodes, initial, train_agent.q_table_path,
+                                                  args.seed, start_episode, evaluator)
+        print(f"Training completed at {episodes_per_sec:.1f} episodes/s! "
+              f"Q-Table saved in '{train_agent.q_table_path}'.")